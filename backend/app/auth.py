@@ -8,6 +8,8 @@ from sqlalchemy import select
 from .config import settings
 from .deps import SessionLocal as Session
 from .models import User
+from .map_state import buffer_map_state, get_buffered_map_state
+from .workers import run_cpu
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 COOKIE_NAME = "access_token"
@@ -37,7 +39,8 @@ def _extract_token(request: Request) -> str | None:
     return tok
 
 
-async def get_current_user(request: Request):
+async def get_current_user_id(request: Request) -> int:
+    # token check only, no database round-trip
     token = _extract_token(request)
     if not token:
         raise HTTPException(401)
@@ -45,7 +48,10 @@ async def get_current_user(request: Request):
         payload = jwt.decode(token, settings.JWT_SECRET, algorithms=["HS256"])
     except Exception:
         raise HTTPException(401)
-    uid = int(payload["sub"])
+    return int(payload["sub"])
+
+
+async def get_current_user(uid: int = Depends(get_current_user_id)):
     async with Session() as s:
         user = (await s.execute(select(User).where(User.id == uid))).scalar_one_or_none()
         if not user:
@@ -59,7 +65,7 @@ async def register(creds: Creds):
         exists = (await s.execute(select(User).where(User.email == creds.email))).scalar_one_or_none()
         if exists:
             raise HTTPException(400, "email taken")
-        u = User(email=creds.email, password_hash=bcrypt.hash(creds.password))
+        u = User(email=creds.email, password_hash=await run_cpu(bcrypt.hash, creds.password))
         s.add(u)
         await s.commit()
     return {"ok": True}
@@ -69,7 +75,7 @@ async def register(creds: Creds):
 async def login(creds: Creds, resp: Response):
     async with Session() as s:
         u = (await s.execute(select(User).where(User.email == creds.email))).scalar_one_or_none()
-        if not u or not bcrypt.verify(creds.password, u.password_hash):
+        if not u or not await run_cpu(bcrypt.verify, creds.password, u.password_hash):
             raise HTTPException(401, "bad creds")
     token = create_token(u.id)
     resp.set_cookie(
@@ -91,16 +97,17 @@ async def logout(resp: Response):
 
 @router.get("/me")
 async def me(user: User = Depends(get_current_user)):
-    # map_state may be missing — return null
+    # map_state may be missing — return null; unflushed saves take precedence
     email = getattr(user, "email", None)
-    map_state = getattr(user, "map_state", None)
+    map_state = await get_buffered_map_state(user.id)
+    if map_state is None:
+        map_state = getattr(user, "map_state", None)
     return {"id": user.id, "email": email, "map_state": map_state}
 
 
 @router.put("/me/map-state")
-async def save_map_state(state: dict, user: User = Depends(get_current_user)):
-    async with Session() as s:
-        dbu = await s.get(User, user.id)
-        setattr(dbu, "map_state", state)
-        await s.commit()
+async def save_map_state(state: dict, uid: int = Depends(get_current_user_id)):
+    # buffered in Redis and written to `users` in batches by the map state flusher;
+    # the uid comes from the token so a save never touches the database
+    await buffer_map_state(uid, state)
     return {"ok": True}
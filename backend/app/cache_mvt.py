@@ -7,6 +7,9 @@ from redis.asyncio import Redis
 # TTL for tiles cache in seconds (default: 1 day)
 TTL = int(os.getenv("CACHE_TTL_SECONDS", "86400"))
 
+# Highest zoom advertised to clients; beyond it they overzoom the last tile level
+MVT_MAX_ZOOM = int(os.getenv("MVT_MAX_ZOOM", "16"))
+
 # Redis client instance for caching tiles
 redis = Redis.from_url(os.getenv("REDIS_URL", "redis://redis:6379/1"),
                        decode_responses=False)
@@ -23,7 +26,7 @@ async def get_layer_version(db: AsyncSession, layer_id: int) -> int:
     v = await db.scalar(
         text("""
         SELECT COALESCE(
-            extract(epoch FROM updated_at), 0
+            extract(epoch FROM updated_at) * 1000, 0
         )::bigint
         FROM layers
         WHERE id = :id
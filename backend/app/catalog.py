@@ -0,0 +1,115 @@
+import os
+import asyncio
+from datetime import datetime
+from typing import Any, Optional
+from pydantic import BaseModel, TypeAdapter
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache_mvt import redis, MVT_MAX_ZOOM
+
+# How long the catalog version is trusted before Postgres is asked again (seconds)
+CATALOG_VERSION_TTL = int(os.getenv("CATALOG_VERSION_TTL_SECONDS", "30"))
+CATALOG_VERSION_KEY = "layers_catalog_ver"
+# Built catalogs are shared by every worker process through Redis, one key per version
+CATALOG_KEY = "layers_catalog:{ver}"
+CATALOG_TTL = int(os.getenv("CATALOG_TTL_SECONDS", "3600"))
+
+
+class LayerOut(BaseModel):
+    id: int
+    public_id: str
+    name: str
+    description: Optional[str] = None
+    copyrights: Optional[Any] = None
+    is_default: bool = False
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    version: int
+    bbox: Optional[dict] = None
+    feature_count: int
+    min_zoom: Optional[int] = None
+    max_zoom: Optional[int] = None
+    # set when every feature is an H3 cell: such layers can be served as compact H3 tiles
+    h3_resolution: Optional[int] = None
+
+
+_layers_adapter = TypeAdapter(list[LayerOut])
+
+# Process-level copy of the Redis catalog: (catalog version, layers ordered by id, layers by id)
+_catalog: tuple[str, list[LayerOut], dict[int, LayerOut]] | None = None
+_catalog_lock = asyncio.Lock()
+
+
+async def get_catalog_version(db: AsyncSession) -> str:
+    v = await redis.get(CATALOG_VERSION_KEY)
+    if v is not None:
+        return v.decode()
+
+    row = (await db.execute(text("""
+        SELECT
+            count(*) AS n,
+            COALESCE(max(extract(epoch FROM updated_at)) * 1000, 0)::bigint AS ts
+        FROM layers
+    """))).one()
+    ver = f"{row.n}-{row.ts}"
+    await redis.setex(CATALOG_VERSION_KEY, CATALOG_VERSION_TTL, ver.encode())
+    return ver
+
+
+# feature_count / extent / h3_resolution are maintained on `layers` by the loaders
+# (refresh_layer_summary) and the streaming consumer, so a rebuild never scans `features`
+CATALOG_SQL = text("""
+    SELECT
+        l.id, l.public_id, l.name, l.description, l.copyrights, l.is_default,
+        l.created_at, l.updated_at,
+        COALESCE(extract(epoch FROM l.updated_at) * 1000, 0)::bigint AS version,
+        l.feature_count,
+        ST_AsGeoJSON(COALESCE(l.bbox, l.extent))::jsonb AS bbox,
+        l.h3_resolution
+    FROM layers l
+    ORDER BY l.id
+""")
+
+
+async def _build_catalog(db: AsyncSession) -> list[LayerOut]:
+    rows = (await db.execute(CATALOG_SQL)).mappings().all()
+    layers = []
+    for r in rows:
+        r = dict(r)
+        if r["feature_count"] > 0:
+            # tiles are cut from the same full-precision features at every zoom, so the whole
+            # MVT range is advertised; layers without data get no range and are skipped
+            r["min_zoom"] = 0
+            r["max_zoom"] = MVT_MAX_ZOOM
+        layers.append(LayerOut(**r))
+        # keep the per-layer tile cache version in step with the catalog
+        await redis.setex(f"layer_ver:{r['id']}", 3600, str(r["version"]).encode())
+    return layers
+
+
+async def _load_catalog(db: AsyncSession, ver: str) -> list[LayerOut]:
+    key = CATALOG_KEY.format(ver=ver)
+    cached = await redis.get(key)
+    if cached is not None:
+        return _layers_adapter.validate_json(cached)
+    layers = await _build_catalog(db)
+    await redis.setex(key, CATALOG_TTL, _layers_adapter.dump_json(layers))
+    return layers
+
+
+async def get_catalog(db: AsyncSession) -> tuple[str, list[LayerOut], dict[int, LayerOut]]:
+    """
+    Return the layer catalog; a new catalog version is loaded from Redis, and built from
+    `layers` only by the first worker that needs it.
+    """
+    global _catalog
+    ver = await get_catalog_version(db)
+    if _catalog is not None and _catalog[0] == ver:
+        return _catalog
+
+    async with _catalog_lock:
+        if _catalog is None or _catalog[0] != ver:
+            layers = await _load_catalog(db, ver)
+            _catalog = (ver, layers, {l.id: l for l in layers})
+    return _catalog
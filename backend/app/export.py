@@ -0,0 +1,257 @@
+import os
+import json
+import shutil
+import uuid
+import hashlib
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyogrio.raw import write_arrow
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi.responses import FileResponse, JSONResponse
+from sqlalchemy import text, Float, bindparam
+
+from .deps import SessionLocal, get_current_user
+from .cache_mvt import redis, get_layer_version
+from .catalog import get_catalog
+from .geo import build_property_filter
+from .workers import run_cpu
+
+router = APIRouter(prefix="", tags=["export"])
+
+# Directory where generated exports are kept, one subdirectory per layer version
+EXPORT_DIR = os.getenv("EXPORT_DIR", "/tmp/forest-exports")
+# Exports above this many features are generated in the background
+EXPORT_SYNC_MAX_FEATURES = int(os.getenv("EXPORT_SYNC_MAX_FEATURES", "50000"))
+# Rows per GeoParquet row group (also the DB fetch batch size)
+EXPORT_ROW_GROUP_SIZE = int(os.getenv("EXPORT_ROW_GROUP_SIZE", "10000"))
+# How long a background export may hold its lock before another request retries it
+EXPORT_LOCK_TTL = int(os.getenv("EXPORT_LOCK_TTL_SECONDS", "1800"))
+
+FORMATS = {
+    "fgb": "application/flatgeobuf",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _parse_bbox(bbox: str | None) -> tuple[float, float, float, float] | None:
+    if not bbox:
+        return None
+    try:
+        minx, miny, maxx, maxy = (float(v) for v in bbox.split(","))
+    except ValueError:
+        raise HTTPException(400, "Invalid bbox; expected minx,miny,maxx,maxy")
+    if minx > maxx or miny > maxy:
+        raise HTTPException(400, "Invalid bbox; min must not exceed max")
+    return minx, miny, maxx, maxy
+
+
+def _export_path(layer_id: int, ver: int, fmt: str, bbox, filter: list[str]) -> str:
+    digest = hashlib.sha1(
+        json.dumps({"bbox": bbox, "filter": sorted(filter)}).encode()
+    ).hexdigest()[:16]
+    return os.path.join(EXPORT_DIR, str(layer_id), f"v{ver}", f"{digest}.{fmt}")
+
+
+def _export_query(layer_id: int, bbox, filter: list[str]):
+    where_clauses, params, bind_params = build_property_filter(layer_id, filter)
+    if bbox:
+        where_clauses.append("geom && ST_MakeEnvelope(:minx, :miny, :maxx, :maxy, 4326)")
+        params.update(zip(("minx", "miny", "maxx", "maxy"), bbox))
+        bind_params.extend(bindparam(n, type_=Float) for n in ("minx", "miny", "maxx", "maxy"))
+    return " AND ".join(where_clauses), params, bind_params
+
+
+def _text_value(v) -> str | None:
+    # Same textual form as `properties ->> key`, so exported columns match API filters
+    if v is None:
+        return None
+    return v if isinstance(v, str) else json.dumps(v)
+
+
+def _drop_stale_versions(layer_id: int, ver: int):
+    # only older versions: a slow build finishing late must not remove newer exports
+    layer_dir = os.path.join(EXPORT_DIR, str(layer_id))
+    for name in os.listdir(layer_dir):
+        if name.startswith("v") and name[1:].isdigit() and int(name[1:]) < ver:
+            shutil.rmtree(os.path.join(layer_dir, name), ignore_errors=True)
+
+
+def _write_partition(writer: pq.ParquetWriter, schema: pa.Schema, keys: list[str], part):
+    # rows -> Arrow columns -> one row group; all of it CPU work kept off the event loop
+    columns = [
+        pa.array([bytes(r.wkb) for r in part], pa.binary()),
+        pa.array(
+            [{"xmin": r.xmin, "ymin": r.ymin, "xmax": r.xmax, "ymax": r.ymax} for r in part],
+            schema.field("bbox").type,
+        ),
+    ] + [
+        pa.array([_text_value(r.properties.get(k)) for r in part], pa.string())
+        for k in keys
+    ]
+    table = pa.Table.from_arrays(columns, schema=schema)
+    writer.write_table(table, row_group_size=EXPORT_ROW_GROUP_SIZE)
+
+
+def _parquet_to_flatgeobuf(parquet_path: str, path: str, keys: list[str], layer: str):
+    pf = pq.ParquetFile(parquet_path)
+    batches = pf.iter_batches(batch_size=EXPORT_ROW_GROUP_SIZE, columns=["geometry", *keys])
+    reader = pa.RecordBatchReader.from_batches(pf.schema_arrow.remove(1), batches)
+    # GDAL's FlatGeobuf driver builds the packed Hilbert R-tree (SPATIAL_INDEX=YES) on close
+    write_arrow(
+        reader,
+        path,
+        layer=layer,
+        driver="FlatGeobuf",
+        geometry_name="geometry",
+        geometry_type="Unknown",
+        crs="EPSG:4326",
+        layer_options={"SPATIAL_INDEX": "YES"},
+    )
+
+
+async def build_export(layer_id: int, ver: int, fmt: str, bbox, filter: list[str], path: str):
+    """
+    Stream the selected features of a layer from PostGIS into a FlatGeobuf or GeoParquet file.
+    Rows are ordered by geohash so that row groups / index nodes are spatially compact.
+    """
+    where, params, bind_params = _export_query(layer_id, bbox, filter)
+    stats_sql = text(f"""
+        SELECT
+            count(*) AS n,
+            ST_XMin(ST_Extent(geom)) AS xmin, ST_YMin(ST_Extent(geom)) AS ymin,
+            ST_XMax(ST_Extent(geom)) AS xmax, ST_YMax(ST_Extent(geom)) AS ymax,
+            COALESCE(array_agg(DISTINCT substr(ST_GeometryType(geom), 4)), '{{}}') AS geometry_types
+        FROM features
+        WHERE {where}
+    """).bindparams(*bind_params)
+    keys_sql = text(f"""
+        SELECT DISTINCT jsonb_object_keys(properties) AS k
+        FROM features
+        WHERE {where}
+        ORDER BY 1
+    """).bindparams(*bind_params)
+    rows_sql = text(f"""
+        SELECT
+            ST_AsBinary(geom) AS wkb,
+            ST_XMin(geom) AS xmin, ST_YMin(geom) AS ymin,
+            ST_XMax(geom) AS xmax, ST_YMax(geom) AS ymax,
+            properties
+        FROM features
+        WHERE {where}
+        ORDER BY ST_GeoHash(ST_Centroid(ST_Envelope(geom)), 12)
+    """).bindparams(*bind_params)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    # FlatGeobuf can't be appended to: rows are spooled to GeoParquet first, then
+    # converted batch by batch through GDAL
+    parquet_path = tmp_path if fmt == "parquet" else f"{tmp_path}.parquet"
+
+    async with SessionLocal() as db:
+        stats = (await db.execute(stats_sql, params)).mappings().one()
+        keys = [r.k for r in (await db.execute(keys_sql, params)).fetchall()]
+        result = await db.stream(rows_sql, params)
+
+        bbox_type = pa.struct([(c, pa.float64()) for c in ("xmin", "ymin", "xmax", "ymax")])
+        schema = pa.schema(
+            [pa.field("geometry", pa.binary()), pa.field("bbox", bbox_type)]
+            + [pa.field(k, pa.string()) for k in keys]
+        )
+        geo = {
+            "version": "1.1.0",
+            "primary_column": "geometry",
+            "columns": {
+                "geometry": {
+                    "encoding": "WKB",
+                    "geometry_types": sorted(stats["geometry_types"]),
+                    "bbox": [stats["xmin"], stats["ymin"], stats["xmax"], stats["ymax"]]
+                    if stats["n"] else [],
+                    "covering": {
+                        "bbox": {c: ["bbox", c] for c in ("xmin", "ymin", "xmax", "ymax")}
+                    },
+                }
+            },
+        }
+        schema = schema.with_metadata({"geo": json.dumps(geo)})
+        writer = pq.ParquetWriter(parquet_path, schema, compression="zstd", write_statistics=True)
+        try:
+            # one DB partition == one row group, with min/max stats on the bbox columns
+            async for part in result.partitions(EXPORT_ROW_GROUP_SIZE):
+                await run_cpu(_write_partition, writer, schema, keys, part)
+        finally:
+            await run_cpu(writer.close)
+
+    if fmt == "fgb":
+        try:
+            await run_cpu(_parquet_to_flatgeobuf, parquet_path, tmp_path, keys, f"layer_{layer_id}")
+        finally:
+            if os.path.exists(parquet_path):
+                os.remove(parquet_path)
+
+    os.replace(tmp_path, path)
+    _drop_stale_versions(layer_id, ver)
+
+
+async def _build_export_in_background(lock_key: str, *args):
+    try:
+        await build_export(*args)
+    finally:
+        await redis.delete(lock_key)
+
+
+@router.get("/layers/{layer_id}/export")
+async def export_layer(
+    layer_id: int,
+    background_tasks: BackgroundTasks,
+    format: str = Query("parquet", description="Export format: `fgb` (FlatGeobuf) or `parquet` (GeoParquet)"),
+    bbox: str | None = Query(None, description="minx,miny,maxx,maxy in EPSG:4326"),
+    filter: list[str] = Query(default=[],
+                              description="Repeated parameter in the format key:value"),
+    user = Depends(get_current_user),
+):
+    """
+    Export a layer, optionally filtered by bbox and properties, as FlatGeobuf or GeoParquet.
+    Exports are cached per layer version; large ones are built in the background and
+    answered with 202 until ready.
+    """
+    if format not in FORMATS:
+        raise HTTPException(400, f"Unsupported format {format!r}; expected one of {sorted(FORMATS)}")
+    box = _parse_bbox(bbox)
+
+    async with SessionLocal() as db:
+        _, _, by_id = await get_catalog(db)
+        if layer_id not in by_id:
+            raise HTTPException(status_code=404, detail="Layer not found")
+        ver = await get_layer_version(db, layer_id)
+        path = _export_path(layer_id, ver, format, box, filter)
+        # checked once: a concurrent newer build may remove this version's files meanwhile
+        cached = os.path.exists(path)
+        if not cached:
+            # only needed to choose between a synchronous and a background build
+            where, params, bind_params = _export_query(layer_id, box, filter)
+            count = await db.scalar(
+                text(f"SELECT count(*) FROM features WHERE {where}").bindparams(*bind_params), params
+            )
+
+    filename = f"layer_{layer_id}_v{ver}.{format}"
+    if not cached:
+        args = (layer_id, ver, format, box, filter, path)
+        if count <= EXPORT_SYNC_MAX_FEATURES:
+            await build_export(*args)
+        else:
+            lock_key = f"export:{layer_id}:v{ver}:{os.path.basename(path)}"
+            if await redis.set(lock_key, b"1", nx=True, ex=EXPORT_LOCK_TTL):
+                background_tasks.add_task(_build_export_in_background, lock_key, *args)
+            return JSONResponse(
+                {"status": "pending", "layer_id": layer_id, "version": ver, "features": count},
+                status_code=202,
+                headers={"Retry-After": "10"},
+            )
+
+    return FileResponse(
+        path,
+        media_type=FORMATS[format],
+        filename=filename,
+        headers={"ETag": f'"{layer_id}-{ver}-{os.path.basename(path)}"',
+                 "Cache-Control": "private, max-age=3600"},
+    )
@@ -1,10 +1,16 @@
 from fastapi import APIRouter, Response, Depends, Request, Query, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from sqlalchemy import text, Integer, String, bindparam
 from sqlalchemy.ext.asyncio import AsyncSession
 from .deps import get_session, get_current_user
 from .cache_mvt import redis, TTL, get_layer_version, tile_cache_key, MVT_SQL
-import hashlib
+from .catalog import LayerOut, get_catalog
+from .stats import polygon_statistics
+from .h3_tiles import (H3_TILE_SQL, H3_TILE_MEDIA_TYPE, h3_tile_cache_key,
+                       h3_resolution_for_zoom, encode_h3_tile)
+from .workers import run_cpu
 
 router = APIRouter(prefix="", tags=["geo"])
 
@@ -12,59 +18,10 @@ class GeoJSONPolygon(BaseModel):
     type: str
     coordinates: list
 
-@router.get("/layers/")
-async def get_layers(
-    db: AsyncSession = Depends(get_session),
-    user = Depends(get_current_user),
-):
-    sql = text("""
-        SELECT
-            id, name, description, created_at,
-            CASE WHEN bbox IS NOT NULL THEN ST_AsGeoJSON(bbox)::jsonb ELSE NULL END AS bbox
-        FROM layers
-        ORDER BY id
-    """)
-    result = await db.execute(sql)
-    rows = result.fetchall()
-    return [
-        {
-            "id": r.id,
-            "name": r.name,
-            "description": r.description,
-            "created_at": r.created_at.isoformat().replace("+00:00", "Z") if r.created_at else None,
-            "bbox": r.bbox,
-        }
-        for r in rows
-    ]
-
-@router.get("/layers/{layer_id}")
-async def get_layer(
-    layer_id: int,
-    db: AsyncSession = Depends(get_session),
-    user = Depends(get_current_user),
-):
+def build_property_filter(layer_id: int, filter: list[str]):
     """
-    Fetch details of a specific layer by its ID.
-    """
-    stmt = text("SELECT * FROM layers WHERE id = :id").bindparams(
-        bindparam("id", type_=Integer)
-    )
-    res = await db.execute(stmt, {"id": layer_id})
-    row = res.mappings().first()
-    if not row:
-        raise HTTPException(status_code=404, detail="Layer not found")
-    return dict(row)
-
-@router.get("/layers/{layer_id}/features")
-async def get_features(
-    layer_id: int,
-    filter: list[str] = Query(default=[],
-                              description="Repeated parameter in the format key:value"),
-    db: AsyncSession = Depends(get_session),
-    user = Depends(get_current_user),
-):
-    """
-    Fetch features from a specific layer as GeoJSON, filtered by key-value pairs in the `properties` JSONB field.
+    Parse repeated `key:value` filters into WHERE clauses, params and bind params
+    matching on the `properties` JSONB field of a layer's features.
     """
     # Parse and validate filters
     if len(filter) > 20:
@@ -91,6 +48,60 @@ async def get_features(
         bind_params.append(bindparam(k_name, type_=String))
         bind_params.append(bindparam(v_name, type_=String))
 
+    return where_clauses, params, bind_params
+
+def _not_modified(request: Request, etag: str) -> bool:
+    return etag in [t.strip() for t in request.headers.get("if-none-match", "").split(",")]
+
+@router.get("/layers/", response_model=list[LayerOut])
+async def get_layers(
+    request: Request,
+    db: AsyncSession = Depends(get_session),
+    user = Depends(get_current_user),
+):
+    """
+    List all layers from the process-level catalog cache, revalidated with an ETag.
+    """
+    ver, layers, _ = await get_catalog(db)
+    etag = f'W/"catalog-{ver}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(jsonable_encoder(layers), headers=headers)
+
+@router.get("/layers/{layer_id}", response_model=LayerOut)
+async def get_layer(
+    layer_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_session),
+    user = Depends(get_current_user),
+):
+    """
+    Fetch details of a specific layer by its ID.
+    """
+    _, _, by_id = await get_catalog(db)
+    layer = by_id.get(layer_id)
+    if not layer:
+        raise HTTPException(status_code=404, detail="Layer not found")
+    etag = f'W/"layer-{layer.id}-{layer.version}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(jsonable_encoder(layer), headers=headers)
+
+@router.get("/layers/{layer_id}/features")
+async def get_features(
+    layer_id: int,
+    filter: list[str] = Query(default=[],
+                              description="Repeated parameter in the format key:value"),
+    db: AsyncSession = Depends(get_session),
+    user = Depends(get_current_user),
+):
+    """
+    Fetch features from a specific layer as GeoJSON, filtered by key-value pairs in the `properties` JSONB field.
+    """
+    where_clauses, params, bind_params = build_property_filter(layer_id, filter)
+
     sql = text(f"""
         SELECT jsonb_build_object(
             'type','FeatureCollection',
@@ -99,13 +110,14 @@ async def get_features(
                 'geometry', ST_AsGeoJSON(geom)::jsonb,
                 'properties', properties
             )), '[]'::jsonb)
-        ) AS geojson
+        )::text AS geojson
         FROM features
         WHERE {' AND '.join(where_clauses)}
     """).bindparams(*bind_params)
 
+    # already serialized by Postgres: pass the text through instead of parsing and re-encoding it
     result = await db.scalar(sql, params)
-    return result or {"type": "FeatureCollection", "features": []}
+    return Response(result or '{"type":"FeatureCollection","features":[]}', media_type="application/json")
 
 @router.get("/tiles/layer/{layer_id}/{z}/{x}/{y}.mvt")
 async def layer_mvt(
@@ -116,10 +128,11 @@ async def layer_mvt(
 ):
     ver = await get_layer_version(db, layer_id)
     key = tile_cache_key(layer_id, ver, z, x, y)
+    # the cache key already pins the layer version and tile, no need to hash the body
+    etag = f'"{key}"'
 
     cached = await redis.get(key)
     if cached:
-        etag = hashlib.md5(cached).hexdigest()
         return Response(cached, media_type="application/vnd.mapbox-vector-tile",
                         headers={"Cache-Control": f"public, max-age={TTL}", "ETag": etag})
 
@@ -127,55 +140,53 @@ async def layer_mvt(
     payload = bytes(data or b"")
     if payload:
         await redis.setex(key, TTL, payload)
-    etag = hashlib.md5(payload).hexdigest()
     return Response(payload, media_type="application/vnd.mapbox-vector-tile",
                     headers={"Cache-Control": f"public, max-age={TTL}", "ETag": etag})
 
+@router.get("/tiles/layer/{layer_id}/{z}/{x}/{y}.h3")
+async def layer_h3_tile(
+    layer_id: int, z: int, x: int, y: int,
+    value: str = Query("population", description="Numeric property summed per cell"),
+    res: int | None = Query(None, ge=0, le=15, description="H3 resolution; derived from zoom by default"),
+    db: AsyncSession = Depends(get_session),
+    user = Depends(get_current_user),
+):
+    """
+    Compact tile for H3-backed layers: cell indexes plus summed values, aggregated to the
+    parent resolution matching the zoom. The client rebuilds hexagon geometry from the cells.
+    """
+    _, _, by_id = await get_catalog(db)
+    layer = by_id.get(layer_id)
+    if not layer:
+        raise HTTPException(status_code=404, detail="Layer not found")
+    if layer.h3_resolution is None:
+        raise HTTPException(status_code=400, detail="Layer is not H3-backed")
+    res = min(res if res is not None else h3_resolution_for_zoom(z, layer.h3_resolution),
+              layer.h3_resolution)
+
+    ver = await get_layer_version(db, layer_id)
+    key = h3_tile_cache_key(layer_id, ver, res, value, z, x, y)
+    etag = f'"{key}"'
+    headers = {"Cache-Control": f"public, max-age={TTL}", "ETag": etag}
+
+    cached = await redis.get(key)
+    if cached:
+        return Response(cached, media_type=H3_TILE_MEDIA_TYPE, headers=headers)
+
+    row = (await db.execute(H3_TILE_SQL, {"layer_id": layer_id, "z": z, "x": x, "y": y,
+                                          "res": res, "value": value})).one()
+    payload = await run_cpu(encode_h3_tile, res, row.cells, row.vals)
+    await redis.setex(key, TTL, payload)
+    return Response(payload, media_type=H3_TILE_MEDIA_TYPE, headers=headers)
+
 @router.post("/get_analysis")
 async def get_analysis(
     geom: GeoJSONPolygon,
     db: AsyncSession = Depends(get_session),
     user = Depends(get_current_user),
 ):
-    sql = text("""
-        WITH input AS (
-            SELECT ST_SetSRID(ST_GeomFromGeoJSON((:gjson)::json), 4326) AS geom
-        ),
-        layers_ref AS (
-            SELECT
-                (SELECT id FROM layers WHERE public_id = 'population_density') AS population_layer_id,
-                (SELECT id FROM layers WHERE public_id = 'bd_foret_v2') AS forest_layer_id
-        ),
-        population AS (
-            SELECT COALESCE(SUM((f.properties->>'population')::bigint), 0) AS total_population
-            FROM features f
-            JOIN input i ON ST_Intersects(f.geom, i.geom)
-            CROSS JOIN layers_ref l
-            WHERE f.layer_id = l.population_layer_id
-        ),
-        forest_stat AS (
-            SELECT COALESCE(JSONB_OBJECT_AGG(type, area_km2), '{}'::jsonb) AS tfv_area_map
-            FROM (
-                SELECT
-                    LOWER(f.properties->>'tfv') AS type,
-                    ROUND((SUM(ST_Area(f.geom::geography)) / 1000000.0)::numeric, 3) AS area_km2
-                FROM features f
-                JOIN input i ON ST_Intersects(f.geom, i.geom)
-                CROSS JOIN layers_ref l
-                WHERE f.layer_id = l.forest_layer_id
-                GROUP BY 1
-            ) s
-        )
-        SELECT
-            p.total_population,
-            fs.tfv_area_map AS statistics
-        FROM population p
-        CROSS JOIN forest_stat fs;
-    """)
-    res = await db.execute(sql, {"gjson": geom.model_dump_json()})
-    row = res.mappings().one()
-    return {
-        "total_population": int(row["total_population"] or 0),
-        "statistics": row.get("statistics") or {}
-    }
-
+    """
+    Population and forest-type areas inside a polygon, composed from the precomputed
+    H3 cell statistics plus an exact computation over the remaining edge.
+    """
+    return await polygon_statistics(db, geom.model_dump_json())
@@ -0,0 +1,87 @@
+import struct
+import numpy as np
+from sqlalchemy import text
+
+# Compact tile format for layers whose features are H3 cells (source_id = H3 index).
+# Instead of hexagon rings, a tile carries the sorted cell indexes and one value per cell;
+# the client rebuilds the hexagons. Little-endian layout:
+#
+#   0   4s  magic b"H3T1"
+#   4   u8  H3 resolution of the cells
+#   5   u8  delta width in bytes (2, 4 or 8)
+#   6   u16 value type (0 = float32)
+#   8   u32 cell count n
+#   12  u32 reserved
+#   16  u64 first cell index
+#   24  (n - 1) cell deltas, zero-padded to a multiple of 8 bytes
+#   ..  n float32 values
+H3_TILE_MAGIC = b"H3T1"
+H3_TILE_HEADER = struct.Struct("<4sBBHIIQ")
+H3_TILE_MEDIA_TYPE = "application/vnd.forest.h3-tile"
+
+
+def h3_resolution_for_zoom(z: int, native_res: int) -> int:
+    # roughly 10-20 px per hexagon edge on 256 px tiles; never finer than the data itself
+    return max(0, min(native_res, int((z - 1) * 0.75)))
+
+
+def h3_tile_cache_key(layer_id: int, ver: int, res: int, value: str, z: int, x: int, y: int) -> str:
+    return f"h3t:{layer_id}:v{ver}:r{res}:{value}:{z}:{x}:{y}"
+
+
+# Children are aggregated into their parent at :res. A parent belongs to the tile holding its
+# centre, so children are looked up in the tile envelope grown by a few parent edge lengths
+# and every parent cell is sent by exactly one tile with its complete sum.
+H3_TILE_SQL = text("""
+WITH b AS (
+    SELECT
+        ST_TileEnvelope(:z, :x, :y) AS g,
+        ST_Expand(ST_TileEnvelope(:z, :x, :y), h3_get_hexagon_edge_length_avg(:res, 'm') * 3) AS gx
+),
+c AS (
+    SELECT
+        h3_cell_to_parent(f.source_id::h3index, :res) AS cell,
+        SUM((f.properties ->> :value)::float8) AS value
+    FROM
+        features f,
+        b
+    WHERE
+        f.layer_id = :layer_id
+        AND f.geom_3857 && b.gx
+    GROUP BY 1
+)
+SELECT
+    COALESCE(array_agg(c.cell::bigint), '{}') AS cells,
+    COALESCE(array_agg(c.value), '{}') AS vals
+FROM
+    c,
+    b
+WHERE
+    ST_Intersects(b.g, ST_Transform(h3_cell_to_geometry(c.cell), 3857));
+""")
+
+
+def encode_h3_tile(res: int, cells, values) -> bytes:
+    """
+    Encode cell indexes and values into the columnar H3 tile format (see module comment).
+    """
+    cells = np.asarray(cells, dtype=np.int64).view(np.uint64)
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64)).astype("<f4")
+    n = cells.size
+    if n == 0:
+        return H3_TILE_HEADER.pack(H3_TILE_MAGIC, res, 2, 0, 0, 0, 0)
+
+    order = np.argsort(cells, kind="stable")
+    cells = cells[order]
+    values = values[order]
+    deltas = np.diff(cells)
+    max_delta = int(deltas.max()) if deltas.size else 0
+    width = 2 if max_delta < 1 << 16 else 4 if max_delta < 1 << 32 else 8
+    delta_bytes = deltas.astype(f"<u{width}").tobytes()
+    padding = b"\0" * (-len(delta_bytes) % 8)
+    return (
+        H3_TILE_HEADER.pack(H3_TILE_MAGIC, res, width, 0, n, 0, int(cells[0]))
+        + delta_bytes
+        + padding
+        + values.tobytes()
+    )
@@ -1,10 +1,27 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
 from app.auth import router as auth_router
 from app.geo import router as geo_router
+from app.export import router as export_router
+from app.stats import router as stats_router
+from app.map_state import run_flusher
+from app.workers import monitor_loop_lag, loop_lag, executor_stats, shutdown_executor
 
-app = FastAPI(title="Forest API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = [asyncio.create_task(run_flusher()), asyncio.create_task(monitor_loop_lag())]
+    yield
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    shutdown_executor()
+
+
+app = FastAPI(title="Forest API", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
@@ -15,3 +32,14 @@ app.add_middleware(
 
 app.include_router(auth_router)
 app.include_router(geo_router)
+app.include_router(export_router)
+app.include_router(stats_router)
+
+
+@app.get("/health", tags=["health"])
+async def health():
+    return {
+        "ok": True,
+        "loop_lag_ms": {k: round(v * 1000, 1) for k, v in loop_lag.items()},
+        "cpu_executor": executor_stats(),
+    }
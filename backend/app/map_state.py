@@ -0,0 +1,94 @@
+import os
+import json
+import asyncio
+import logging
+from sqlalchemy import text
+
+from .cache_mvt import redis
+from .deps import SessionLocal
+
+log = logging.getLogger(__name__)
+
+# Seconds between write-behind flushes of buffered map states to Postgres
+FLUSH_INTERVAL = float(os.getenv("MAP_STATE_FLUSH_INTERVAL_SECONDS", "10"))
+# Max users written per UPDATE statement
+FLUSH_BATCH = int(os.getenv("MAP_STATE_FLUSH_BATCH", "500"))
+# Buffered states outlive several flush intervals so /auth/me can always read through
+BUFFER_TTL = int(os.getenv("MAP_STATE_BUFFER_TTL_SECONDS", "86400"))
+
+DIRTY_KEY = "map_state:dirty"
+
+
+def _state_key(uid: int) -> str:
+    return f"map_state:{uid}"
+
+
+async def buffer_map_state(uid: int, state: dict):
+    """
+    Record the latest map state of a user; repeated saves before a flush coalesce into one write.
+    """
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.setex(_state_key(uid), BUFFER_TTL, json.dumps(state).encode())
+        pipe.sadd(DIRTY_KEY, uid)
+        await pipe.execute()
+
+
+async def get_buffered_map_state(uid: int) -> dict | None:
+    v = await redis.get(_state_key(uid))
+    return json.loads(v) if v is not None else None
+
+
+FLUSH_SQL = text("""
+    UPDATE users u
+    SET map_state = v.state
+    FROM (
+        SELECT unnest(CAST(:ids AS integer[])) AS id,
+               unnest(CAST(:states AS jsonb[])) AS state
+    ) v
+    WHERE u.id = v.id
+""")
+
+
+async def flush_map_states() -> int:
+    """
+    Write all dirty buffered map states to `users` in batches. Returns the number of users written.
+    """
+    written = 0
+    while True:
+        members = await redis.spop(DIRTY_KEY, FLUSH_BATCH)
+        if not members:
+            return written
+        ids = [int(m) for m in members]
+        values = await redis.mget([_state_key(uid) for uid in ids])
+        batch = [(uid, v.decode()) for uid, v in zip(ids, values) if v is not None]
+        if not batch:
+            continue
+        try:
+            async with SessionLocal() as s:
+                await s.execute(FLUSH_SQL, {"ids": [b[0] for b in batch],
+                                            "states": [b[1] for b in batch]})
+                await s.commit()
+        except Exception:
+            # put them back so the next flush retries
+            await redis.sadd(DIRTY_KEY, *ids)
+            raise
+        written += len(batch)
+
+
+async def run_flusher():
+    """
+    Background loop flushing buffered map states every FLUSH_INTERVAL seconds.
+    """
+    try:
+        while True:
+            await asyncio.sleep(FLUSH_INTERVAL)
+            try:
+                await flush_map_states()
+            except Exception:
+                log.exception("map state flush failed")
+    finally:
+        # last flush on shutdown so buffered saves are not left behind
+        try:
+            await flush_map_states()
+        except Exception:
+            log.exception("final map state flush failed")
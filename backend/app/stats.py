@@ -0,0 +1,135 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from .deps import get_session, get_current_user
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+# Precomputed statistics are kept in `zonal_stats` by the refresh_zonal_stats DAG:
+# one row per commune and per coarse H3 parent cell, forest areas in m2 per formation type.
+
+UNIT_SQL = text("""
+    SELECT
+        unit_id,
+        name,
+        total_population,
+        COALESCE((
+            SELECT jsonb_object_agg(key, ROUND((value::float8 / 1000000.0)::numeric, 3))
+            FROM jsonb_each_text(tfv_area_m2)
+        ), '{}'::jsonb) AS statistics,
+        ST_AsGeoJSON(geom)::jsonb AS geometry,
+        updated_at
+    FROM zonal_stats
+    WHERE unit_type = :unit_type AND unit_id = :unit_id
+""")
+
+# A polygon = precomputed H3 cells lying fully inside it + a residual edge computed exactly.
+# The residual is subdivided so index lookups only touch the edge strips, not the whole polygon.
+# Population hexagons count once: via their parent cell, or by their centre in the residual part.
+POLYGON_STATS_SQL = text("""
+    WITH input AS (
+        SELECT ST_SetSRID(ST_GeomFromGeoJSON((:gjson)::json), 4326) AS geom
+    ),
+    layers_ref AS (
+        SELECT
+            (SELECT id FROM layers WHERE public_id = 'population_density') AS population_layer_id,
+            (SELECT id FROM layers WHERE public_id = 'bd_foret_v2') AS forest_layer_id
+    ),
+    inner_units AS MATERIALIZED (
+        SELECT z.unit_id, z.geom, z.total_population, z.tfv_area_m2
+        FROM zonal_stats z
+        JOIN input i ON z.geom && i.geom AND ST_Within(z.geom, i.geom)
+        WHERE z.unit_type = 'h3'
+    ),
+    unit_res AS (
+        SELECT h3_get_resolution(unit_id::h3index) AS res FROM inner_units LIMIT 1
+    ),
+    residual AS MATERIALIZED (
+        SELECT ST_Subdivide(
+            COALESCE(ST_Difference(i.geom, (SELECT ST_Union(geom) FROM inner_units)), i.geom), 64
+        ) AS geom
+        FROM input i
+    ),
+    residual_hexagons AS (
+        SELECT DISTINCT ON (f.id) f.source_id, (f.properties->>'population')::bigint AS population
+        FROM residual r
+        JOIN features f ON f.geom && r.geom AND ST_Intersects(r.geom, ST_PointOnSurface(f.geom))
+        CROSS JOIN layers_ref l
+        WHERE f.layer_id = l.population_layer_id
+    ),
+    residual_population AS (
+        -- hash anti-join: hexagons whose parent cell is already counted in inner_units
+        SELECT COALESCE(SUM(h.population), 0) AS total
+        FROM residual_hexagons h
+        LEFT JOIN inner_units u
+          ON u.unit_id = h3_cell_to_parent(h.source_id::h3index, (SELECT res FROM unit_res))::text
+        WHERE u.unit_id IS NULL
+    ),
+    forest_parts AS (
+        SELECT e.key AS type, e.value::float8 AS area_m2
+        FROM inner_units u, jsonb_each_text(u.tfv_area_m2) e
+        UNION ALL
+        SELECT LOWER(f.properties->>'tfv'), ST_Area(ST_Intersection(f.geom, r.geom)::geography)
+        FROM features f
+        JOIN residual r ON f.geom && r.geom AND ST_Intersects(f.geom, r.geom)
+        CROSS JOIN layers_ref l
+        WHERE f.layer_id = l.forest_layer_id
+          AND f.properties->>'tfv' IS NOT NULL
+    ),
+    forest_stat AS (
+        SELECT COALESCE(JSONB_OBJECT_AGG(type, area_km2), '{}'::jsonb) AS tfv_area_map
+        FROM (
+            SELECT type, ROUND((SUM(area_m2) / 1000000.0)::numeric, 3) AS area_km2
+            FROM forest_parts
+            GROUP BY 1
+        ) s
+    )
+    SELECT
+        (SELECT COALESCE(SUM(total_population), 0) FROM inner_units)
+            + (SELECT total FROM residual_population) AS total_population,
+        (SELECT tfv_area_map FROM forest_stat) AS statistics,
+        (SELECT count(*) FROM inner_units) AS precomputed_units
+""")
+
+
+async def polygon_statistics(db: AsyncSession, gjson: str) -> dict:
+    """
+    Population and forest-type areas (km2) inside a GeoJSON polygon.
+    """
+    row = (await db.execute(POLYGON_STATS_SQL, {"gjson": gjson})).mappings().one()
+    return {
+        "total_population": int(row["total_population"] or 0),
+        "statistics": row["statistics"] or {},
+        "precomputed_units": int(row["precomputed_units"] or 0),
+    }
+
+
+async def _unit_statistics(db: AsyncSession, unit_type: str, unit_id: str) -> dict:
+    row = (await db.execute(UNIT_SQL, {"unit_type": unit_type, "unit_id": unit_id})).mappings().first()
+    if not row:
+        raise HTTPException(status_code=404, detail="No statistics for this unit")
+    return dict(row)
+
+
+@router.get("/communes/{commune_id}")
+async def commune_statistics(
+    commune_id: str,
+    db: AsyncSession = Depends(get_session),
+    user = Depends(get_current_user),
+):
+    """
+    Precomputed population and forest statistics of a commune (its cadastre id).
+    """
+    return await _unit_statistics(db, "commune", commune_id)
+
+
+@router.get("/h3/{cell}")
+async def h3_statistics(
+    cell: str,
+    db: AsyncSession = Depends(get_session),
+    user = Depends(get_current_user),
+):
+    """
+    Precomputed population and forest statistics of an H3 parent cell.
+    """
+    return await _unit_statistics(db, "h3", cell)
@@ -0,0 +1,74 @@
+import os
+import time
+import asyncio
+import logging
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException
+
+log = logging.getLogger(__name__)
+
+# Uvicorn worker processes share the machine, so split the cores between them
+_processes = int(os.getenv("WEB_CONCURRENCY", "1"))
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", str(max(1, (os.cpu_count() or 1) // _processes))))
+# Jobs allowed to wait for a CPU worker before callers get 503
+CPU_QUEUE_MAX = int(os.getenv("CPU_QUEUE_MAX", "64"))
+# Seconds a caller waits for a queue slot before giving up
+CPU_QUEUE_TIMEOUT = float(os.getenv("CPU_QUEUE_TIMEOUT_SECONDS", "5"))
+
+# Event loop lag sampling interval and warning threshold (seconds)
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL_SECONDS", "0.5"))
+LOOP_LAG_WARN = float(os.getenv("LOOP_LAG_WARN_SECONDS", "0.1"))
+
+_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+_slots = asyncio.Semaphore(CPU_WORKERS + CPU_QUEUE_MAX)
+_pending = 0
+
+loop_lag = {"last": 0.0, "max": 0.0, "avg": 0.0}
+
+
+async def run_cpu(fn, *args, **kwargs):
+    """
+    Run a blocking / CPU-bound callable off the event loop on the bounded CPU executor.
+    Raises 503 when the executor queue stays full for CPU_QUEUE_TIMEOUT seconds.
+    """
+    global _pending
+    try:
+        await asyncio.wait_for(_slots.acquire(), CPU_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(503, "Server busy", headers={"Retry-After": "1"})
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_executor, functools.partial(fn, *args, **kwargs))
+    finally:
+        _pending -= 1
+        _slots.release()
+
+
+def executor_stats() -> dict:
+    return {
+        "workers": CPU_WORKERS,
+        "queue_max": CPU_QUEUE_MAX,
+        "in_flight": _pending,
+    }
+
+
+async def monitor_loop_lag():
+    """
+    Measure how late the event loop wakes up from a sleep; that delay is time some
+    coroutine spent blocking the loop.
+    """
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lag = max(0.0, time.perf_counter() - start - LOOP_LAG_INTERVAL)
+        loop_lag["last"] = lag
+        loop_lag["max"] = max(loop_lag["max"], lag)
+        loop_lag["avg"] = 0.9 * loop_lag["avg"] + 0.1 * lag
+        if lag > LOOP_LAG_WARN:
+            log.warning("event loop blocked for %.0f ms", lag * 1000)
+
+
+def shutdown_executor():
+    _executor.shutdown(wait=False, cancel_futures=True)
@@ -1,7 +1,9 @@
 from airflow import DAG
 from airflow.operators.python import PythonOperator
+from airflow.operators.trigger_dagrun import TriggerDagRunOperator
 from shared.postgres_data_management import load_vector_to_postgis, run_sql_script
-from shared.files_management import download_file, delete_file
+from shared.artifact_cache import cached_download, cached_geoparquet, try_publish_geoparquet
+from shared.files_management import delete_file, vsi_path, as_bool
 from datetime import datetime
 import py7zr
 import os
@@ -23,6 +25,13 @@ def extract_shapefile_from_7z(archive_path: str, output_dir: str, target_base: s
             raise ValueError("Shapefile not found in archive!")
         archive.extract(path=output_dir, targets=shapefile_files)
 
+# Task: resolve the shapefile to load, read from the archive unless extraction is requested
+def shapefile_source(archive_path: str, output_dir: str, target_base: str, extract_to_disk=False) -> str:
+    if as_bool(extract_to_disk):
+        extract_shapefile_from_7z(archive_path, output_dir, target_base)
+        return os.path.join(output_dir, f"{target_base}.shp")
+    return vsi_path(archive_path, f"{target_base}.shp")
+
 # DAG and parameters
 default_args = {
     'start_date': datetime(2025, 1, 2),
@@ -33,11 +42,13 @@ with DAG(
     default_args=default_args,
     schedule_interval=None,
     catchup=False,
+    # read the shapefile straight out of the .7z unless an extracted copy is requested
+    params={'extract_to_disk': False},
 ) as dag:
 
     download_task = PythonOperator(
         task_id='download_bd_foret_archive',
-        python_callable=download_file,
+        python_callable=cached_download,
         op_kwargs={
             'url': 'https://data.geopf.fr/telechargement/download/BDFORET/BDFORET_2-0__SHP_LAMB93_D018_2014-04-01/BDFORET_2-0__SHP_LAMB93_D018_2014-04-01.7z',
             'destination_path': '/opt/airflow/data/BDFORET_2-0__SHP_LAMB93_D018_2014-04-01.7z'
@@ -47,19 +58,42 @@ with DAG(
 
     extract_task = PythonOperator(
         task_id='extract_shapefile',
-        python_callable=extract_shapefile_from_7z,
+        python_callable=shapefile_source,
         op_kwargs={
             'archive_path': "{{ ti.xcom_pull(task_ids='download_bd_foret_archive') }}",
             'output_dir': '/opt/airflow/data/extracted_shp/',
-            'target_base': 'BDFORET_2-0__SHP_LAMB93_D018_2014-04-01/BDFORET/1_DONNEES_LIVRAISON/BDF_2-0_SHP_LAMB93_D018/FORMATION_VEGETALE'
-        }
+            'target_base': 'BDFORET_2-0__SHP_LAMB93_D018_2014-04-01/BDFORET/1_DONNEES_LIVRAISON/BDF_2-0_SHP_LAMB93_D018/FORMATION_VEGETALE',
+            'extract_to_disk': '{{ params.extract_to_disk }}',
+        },
+        do_xcom_push=True,
+    )
+
+    normalize_task = PythonOperator(
+        task_id='normalize_source',
+        python_callable=cached_geoparquet,
+        op_kwargs={
+            'vector_path': "{{ ti.xcom_pull(task_ids='extract_shapefile') }}",
+            'destination_path': '/opt/airflow/data/bd_foret_formation_vegetale_d018.parquet',
+            'source_sha256': "{{ ti.xcom_pull(task_ids='download_bd_foret_archive', key='sha256') }}",
+        },
+        do_xcom_push=True,
+    )
+
+    # fill the GeoParquet cache for the next run, off the load path; failures only skip the cache
+    publish_task = PythonOperator(
+        task_id='publish_geoparquet',
+        python_callable=try_publish_geoparquet,
+        op_kwargs={
+            'vector_path': "{{ ti.xcom_pull(task_ids='extract_shapefile') }}",
+            'source_sha256': "{{ ti.xcom_pull(task_ids='download_bd_foret_archive', key='sha256') }}",
+        },
     )
 
     load_task = PythonOperator(
         task_id='load_to_postgis',
         python_callable=load_vector_to_postgis,
         op_kwargs={
-            'vector_path': '/opt/airflow/data/extracted_shp/BDFORET_2-0__SHP_LAMB93_D018_2014-04-01/BDFORET/1_DONNEES_LIVRAISON/BDF_2-0_SHP_LAMB93_D018/FORMATION_VEGETALE.shp',
+            'vector_path': "{{ ti.xcom_pull(task_ids='normalize_source') }}",
             'table_name': 'bd_foret_formation_vegetale'
         }
     )
@@ -85,9 +119,16 @@ with DAG(
         python_callable=lambda paths: [delete_file(path) for path in paths],
         op_kwargs={
             "paths": [
-                "{{ ti.xcom_pull(task_ids='download_task') }}",
+                "{{ ti.xcom_pull(task_ids='download_bd_foret_archive') }}",
+                "{{ ti.xcom_pull(task_ids='normalize_source') }}",
             ]
         },
     )
 
-    download_task >> extract_task >> load_task >> create_layer_task >> hexagonize_task >> cleanup_task
+    zonal_stats_task = TriggerDagRunOperator(
+        task_id='trigger_zonal_stats',
+        trigger_dag_id='refresh_zonal_stats',
+    )
+
+    download_task >> extract_task >> normalize_task >> load_task >> create_layer_task >> hexagonize_task >> zonal_stats_task >> cleanup_task
+    normalize_task >> publish_task >> cleanup_task
@@ -1,7 +1,9 @@
 from airflow import DAG
 from airflow.operators.python import PythonOperator
+from airflow.operators.trigger_dagrun import TriggerDagRunOperator
 from shared.postgres_data_management import load_vector_to_postgis, run_sql_script
-from shared.files_management import download_file, delete_file, unzip_gz_file
+from shared.artifact_cache import cached_download
+from shared.files_management import delete_file, gz_source
 from datetime import datetime
 
 default_args = {
@@ -13,11 +15,13 @@ with DAG(
     default_args=default_args,
     schedule_interval=None,
     catchup=False,
+    # read the .gz in place through /vsigzip/ unless a decompressed copy is requested
+    params={'extract_to_disk': False},
 ) as dag:
 
     download_task = PythonOperator(
         task_id='download_communes_archive',
-        python_callable=download_file,
+        python_callable=cached_download,
         op_kwargs={
             'url': 'https://cadastre.data.gouv.fr/data/etalab-cadastre/latest/geojson/departements/18/cadastre-18-communes.json.gz',
             'destination_path': '/opt/airflow/data/cadastre/cadastre-18-communes.json.gz'
@@ -25,12 +29,13 @@ with DAG(
         do_xcom_push=True,
     )
 
-    unzip_task = PythonOperator(
-        task_id='unzip_gz_file',
-        python_callable=unzip_gz_file,
+    source_task = PythonOperator(
+        task_id='prepare_source',
+        python_callable=gz_source,
         op_kwargs={
             'source_path': "{{ ti.xcom_pull(task_ids='download_communes_archive') }}",
-            'destination_path': '/opt/airflow/data/cadastre/cadastre-18-communes.json'
+            'destination_path': '/opt/airflow/data/cadastre/cadastre-18-communes.json',
+            'extract_to_disk': '{{ params.extract_to_disk }}',
         },
         do_xcom_push=True,
     )
@@ -39,7 +44,7 @@ with DAG(
         task_id="load_communes",
         python_callable=load_vector_to_postgis,
         op_kwargs={
-            "vector_path": "{{ ti.xcom_pull(task_ids='unzip_gz_file') }}",
+            "vector_path": "{{ ti.xcom_pull(task_ids='prepare_source') }}",
             "table_name": "communes",
         },
     )
@@ -58,9 +63,14 @@ with DAG(
         op_kwargs={
             "paths": [
                 "{{ ti.xcom_pull(task_ids='download_communes_archive') }}",
-                "{{ ti.xcom_pull(task_ids='unzip_gz_file') }}",
+                "{{ ti.xcom_pull(task_ids='prepare_source') }}",
             ]
         },
     )
 
-    download_task >> unzip_task >> load_task >> create_layer_task >> cleanup_task
\ No newline at end of file
+    zonal_stats_task = TriggerDagRunOperator(
+        task_id='trigger_zonal_stats',
+        trigger_dag_id='refresh_zonal_stats',
+    )
+
+    download_task >> source_task >> load_task >> create_layer_task >> zonal_stats_task >> cleanup_task
\ No newline at end of file
@@ -1,7 +1,8 @@
 from airflow import DAG
 from airflow.operators.python import PythonOperator
 from shared.postgres_data_management import load_vector_to_postgis, run_sql_script
-from shared.files_management import download_file, delete_file, unzip_gz_file
+from shared.artifact_cache import cached_download
+from shared.files_management import delete_file, gz_source
 from datetime import datetime
 import gzip
 import os
@@ -15,11 +16,13 @@ with DAG(
     default_args=default_args,
     schedule_interval=None,
     catchup=False,
+    # read the .gz in place through /vsigzip/ unless a decompressed copy is requested
+    params={'extract_to_disk': False},
 ) as dag:
 
     download_task = PythonOperator(
         task_id='download_lieux_archive',
-        python_callable=download_file,
+        python_callable=cached_download,
         op_kwargs={
             'url': 'https://cadastre.data.gouv.fr/data/etalab-cadastre/latest/geojson/departements/18/cadastre-18-lieux_dits.json.gz',
             'destination_path': '/opt/airflow/data/cadastre/cadastre-18-lieux.json.gz'
@@ -27,12 +30,13 @@ with DAG(
         do_xcom_push=True,
     )
 
-    unzip_task = PythonOperator(
-        task_id='unzip_gz_file',
-        python_callable=unzip_gz_file,
+    source_task = PythonOperator(
+        task_id='prepare_source',
+        python_callable=gz_source,
         op_kwargs={
             'source_path': "{{ ti.xcom_pull(task_ids='download_lieux_archive') }}",
-            'destination_path': '/opt/airflow/data/cadastre/cadastre-18-lieux.json'
+            'destination_path': '/opt/airflow/data/cadastre/cadastre-18-lieux.json',
+            'extract_to_disk': '{{ params.extract_to_disk }}',
         },
         do_xcom_push=True,
     )
@@ -41,7 +45,7 @@ with DAG(
         task_id="load_lieux",
         python_callable=load_vector_to_postgis,
         op_kwargs={
-            "vector_path": "{{ ti.xcom_pull(task_ids='unzip_gz_file') }}",
+            "vector_path": "{{ ti.xcom_pull(task_ids='prepare_source') }}",
             "table_name": "lieux",
         },
     )
@@ -60,9 +64,9 @@ with DAG(
         op_kwargs={
             "paths": [
                 "{{ ti.xcom_pull(task_ids='download_lieux_archive') }}",
-                "{{ ti.xcom_pull(task_ids='unzip_gz_file') }}",
+                "{{ ti.xcom_pull(task_ids='prepare_source') }}",
             ]
         },
     )
 
-    download_task >> unzip_task >> load_task >> create_layer_task >> cleanup_task
\ No newline at end of file
+    download_task >> source_task >> load_task >> create_layer_task >> cleanup_task
\ No newline at end of file
@@ -43,4 +43,7 @@ update layers
 set updated_at = now()
 where public_id = 'communes_administrative_d18';
 
+-- feature count / extent / H3 resolution read by the layer catalog
+call refresh_layer_summary(array(select id from layers where public_id = 'communes_administrative_d18'));
+
 commit;
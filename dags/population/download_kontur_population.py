@@ -1,7 +1,9 @@
 from airflow import DAG
 from airflow.operators.python import PythonOperator
+from airflow.operators.trigger_dagrun import TriggerDagRunOperator
 from shared.postgres_data_management import load_vector_to_postgis, run_sql_script
-from shared.files_management import download_file, delete_file, unzip_gz_file
+from shared.artifact_cache import cached_download, cached_geoparquet, try_publish_geoparquet
+from shared.files_management import delete_file, gz_source
 from datetime import datetime
 
 default_args = {
@@ -13,11 +15,13 @@ with DAG(
     default_args=default_args,
     schedule_interval=None,
     catchup=False,
+    # read the .gz in place through /vsigzip/ unless a decompressed copy is requested
+    params={'extract_to_disk': False},
 ) as dag:
 
     download_task = PythonOperator(
         task_id='download_population_data',
-        python_callable=download_file,
+        python_callable=cached_download,
         op_kwargs={
             'url': 'https://geodata-eu-central-1-kontur-public.s3.amazonaws.com/kontur_datasets/kontur_population_FR_20231101.gpkg.gz',
             'destination_path': '/opt/airflow/data/kontur_population_FR_20231101.gpkg.gz'
@@ -25,21 +29,43 @@ with DAG(
         do_xcom_push=True,
     )
 
-    unzip_task = PythonOperator(
-        task_id='unzip_gz_file',
-        python_callable=unzip_gz_file,
+    source_task = PythonOperator(
+        task_id='prepare_source',
+        python_callable=gz_source,
         op_kwargs={
             'source_path': "{{ ti.xcom_pull(task_ids='download_population_data') }}",
-            'destination_path': '/opt/airflow/data/kontur_population_FR_20231101.gpkg'
+            'destination_path': '/opt/airflow/data/kontur_population_FR_20231101.gpkg',
+            'extract_to_disk': '{{ params.extract_to_disk }}',
         },
         do_xcom_push=True,
     )
 
+    normalize_task = PythonOperator(
+        task_id='normalize_source',
+        python_callable=cached_geoparquet,
+        op_kwargs={
+            'vector_path': "{{ ti.xcom_pull(task_ids='prepare_source') }}",
+            'destination_path': '/opt/airflow/data/kontur_population_FR_20231101.parquet',
+            'source_sha256': "{{ ti.xcom_pull(task_ids='download_population_data', key='sha256') }}",
+        },
+        do_xcom_push=True,
+    )
+
+    # fill the GeoParquet cache for the next run, off the load path; failures only skip the cache
+    publish_task = PythonOperator(
+        task_id='publish_geoparquet',
+        python_callable=try_publish_geoparquet,
+        op_kwargs={
+            'vector_path': "{{ ti.xcom_pull(task_ids='prepare_source') }}",
+            'source_sha256': "{{ ti.xcom_pull(task_ids='download_population_data', key='sha256') }}",
+        },
+    )
+
     load_task = PythonOperator(
         task_id="load_population",
         python_callable=load_vector_to_postgis,
         op_kwargs={
-            "vector_path": "{{ ti.xcom_pull(task_ids='unzip_gz_file') }}",
+            "vector_path": "{{ ti.xcom_pull(task_ids='normalize_source') }}",
             "table_name": "france_population_h3",
         },
     )
@@ -58,9 +84,16 @@ with DAG(
         op_kwargs={
             "paths": [
                 "{{ ti.xcom_pull(task_ids='download_population_data') }}",
-                "{{ ti.xcom_pull(task_ids='unzip_gz_file') }}",
+                "{{ ti.xcom_pull(task_ids='prepare_source') }}",
+                "{{ ti.xcom_pull(task_ids='normalize_source') }}",
             ]
         },
     )
 
-    download_task >> unzip_task >> load_task >> create_layer_task >> cleanup_task
+    zonal_stats_task = TriggerDagRunOperator(
+        task_id='trigger_zonal_stats',
+        trigger_dag_id='refresh_zonal_stats',
+    )
+
+    download_task >> source_task >> normalize_task >> load_task >> create_layer_task >> zonal_stats_task >> cleanup_task
+    normalize_task >> publish_task >> cleanup_task
@@ -49,4 +49,11 @@ update layers
 set updated_at = now()
 where public_id = 'population_density';
 
+-- feature count / extent / H3 resolution read by the layer catalog
+call refresh_layer_summary(array(select id from layers where public_id = 'population_density'));
+
+-- whole layer replaced: the next zonal stats refresh recomputes it in full
+insert into zonal_stats_dirty (layer_id, extent)
+select id, null from layers where public_id = 'population_density';
+
 commit;
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import logging
+import os
+import uuid
+from urllib.parse import urlparse
+import boto3
+import requests
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import ClientError
+
+# MinIO (S3 API) holding content-addressed DAG input artifacts:
+#   sources/<sha256>                   raw downloads, by content hash
+#   urls/<sha256(url)>.json            upstream url -> etag / last-modified / content hash
+#   normalized/<key>.parquet           GeoParquet conversions of a source
+ARTIFACT_BUCKET = os.getenv("ARTIFACT_BUCKET", "artifacts")
+MINIO_ENDPOINT = os.getenv("MINIO_ENDPOINT", "http://minio:9000")
+ARTIFACT_CONCURRENCY = int(os.getenv("ARTIFACT_CONCURRENCY", "8"))
+
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=64 * 1024 * 1024,
+    multipart_chunksize=64 * 1024 * 1024,
+    max_concurrency=ARTIFACT_CONCURRENCY,
+    use_threads=True,
+)
+CHUNK_SIZE = 8 * 1024 * 1024
+
+log = logging.getLogger(__name__)
+
+def s3_client():
+    return boto3.client(
+        "s3",
+        endpoint_url=MINIO_ENDPOINT,
+        aws_access_key_id=os.getenv("MINIO_ACCESS_KEY"),
+        aws_secret_access_key=os.getenv("MINIO_SECRET_KEY"),
+    )
+
+def _ensure_bucket(s3):
+    try:
+        s3.head_bucket(Bucket=ARTIFACT_BUCKET)
+    except ClientError:
+        s3.create_bucket(Bucket=ARTIFACT_BUCKET)
+
+def _exists(s3, key: str) -> bool:
+    try:
+        s3.head_object(Bucket=ARTIFACT_BUCKET, Key=key)
+        return True
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+
+def _get_json(s3, key: str):
+    try:
+        return json.loads(s3.get_object(Bucket=ARTIFACT_BUCKET, Key=key)["Body"].read())
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+            return None
+        raise
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _url_key(url: str) -> str:
+    return f"urls/{hashlib.sha256(url.encode()).hexdigest()}.json"
+
+def _upstream_version(url: str) -> dict:
+    # a source that can't be HEADed is treated like one without version headers: it is
+    # downloaded again, or served from the cache when the download fails too
+    try:
+        r = requests.head(url, timeout=60, allow_redirects=True)
+        r.raise_for_status()
+    except requests.RequestException as e:
+        log.warning("HEAD %s failed: %s", url, e)
+        return {"etag": None, "last_modified": None}
+    return {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}
+
+def _pull_source(s3, sha: str, destination_path: str, ti=None) -> str:
+    s3.download_file(ARTIFACT_BUCKET, f"sources/{sha}", destination_path, Config=TRANSFER_CONFIG)
+    if ti is not None:
+        ti.xcom_push(key="sha256", value=sha)
+    return os.path.abspath(destination_path)
+
+def cached_download(url: str, destination_path: str, ti=None) -> str:
+    """
+    Download a file like download_file, going through the MinIO artifact cache.
+    When the upstream ETag / Last-Modified matches a cached entry the content is pulled from
+    MinIO (parallel multipart); otherwise it is downloaded, hashed and stored by content hash.
+    When the upstream can't be reached the last cached content for the url is used.
+    Returns the absolute path to the downloaded file; the content hash is pushed to XCom
+    under the key "sha256" when run as an Airflow task.
+    """
+    s3 = s3_client()
+    _ensure_bucket(s3)
+    os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+
+    upstream = _upstream_version(url)
+    entry = _get_json(s3, _url_key(url))
+    if entry and not _exists(s3, f"sources/{entry['sha256']}"):
+        entry = None
+    has_version = upstream["etag"] or upstream["last_modified"]
+    if (entry and has_version
+            and (entry.get("etag"), entry.get("last_modified")) == (upstream["etag"], upstream["last_modified"])):
+        return _pull_source(s3, entry["sha256"], destination_path, ti)
+
+    h = hashlib.sha256()
+    size = 0
+    try:
+        with requests.get(url, timeout=60, stream=True) as response:
+            response.raise_for_status()
+            with open(destination_path, "wb") as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    h.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+    except requests.RequestException as e:
+        if entry is None:
+            raise
+        log.warning("download of %s failed (%s), using the cached copy from %s", url, e, _url_key(url))
+        return _pull_source(s3, entry["sha256"], destination_path, ti)
+    sha = h.hexdigest()
+
+    # identical content published under a new ETag is stored only once
+    if not _exists(s3, f"sources/{sha}"):
+        s3.upload_file(destination_path, ARTIFACT_BUCKET, f"sources/{sha}", Config=TRANSFER_CONFIG)
+    s3.put_object(
+        Bucket=ARTIFACT_BUCKET,
+        Key=_url_key(url),
+        Body=json.dumps({"url": url, "sha256": sha, "size": size, **upstream}).encode(),
+        ContentType="application/json",
+    )
+    if ti is not None:
+        ti.xcom_push(key="sha256", value=sha)
+    return os.path.abspath(destination_path)
+
+def _normalized_key(vector_path: str, source_sha256: str = None) -> str:
+    # imported here so the cache helpers stay usable without geopandas
+    from shared.postgres_data_management import source_file
+
+    source = source_file(vector_path)
+    # templated XCom pulls render a missing value as "None"
+    if not source_sha256 or source_sha256 == "None":
+        source_sha256 = file_sha256(source)
+    # same archive read through a different /vsi path or member is a different artifact
+    variant = hashlib.sha256(vector_path.replace(source, "", 1).encode()).hexdigest()[:12]
+    return f"normalized/{source_sha256}-{variant}.parquet"
+
+def cached_geoparquet(vector_path: str, destination_path: str, source_sha256: str = None) -> str:
+    """
+    Return a local GeoParquet conversion of vector_path (plain or GDAL /vsi path) when one is
+    stored in MinIO for the same source content, otherwise vector_path itself so the loader
+    reads the source directly; publish_geoparquet fills the cache for the next run.
+    source_sha256 is the content hash from cached_download, so the source isn't hashed again.
+    """
+    key = _normalized_key(vector_path, source_sha256)
+    s3 = s3_client()
+    _ensure_bucket(s3)
+    if not _exists(s3, key):
+        return vector_path
+    os.makedirs(os.path.dirname(destination_path), exist_ok=True)
+    s3.download_file(ARTIFACT_BUCKET, key, destination_path, Config=TRANSFER_CONFIG)
+    return os.path.abspath(destination_path)
+
+def _arrow_s3():
+    from pyarrow import fs
+
+    endpoint = urlparse(MINIO_ENDPOINT)
+    return fs.S3FileSystem(
+        access_key=os.getenv("MINIO_ACCESS_KEY"),
+        secret_key=os.getenv("MINIO_SECRET_KEY"),
+        endpoint_override=endpoint.netloc,
+        scheme=endpoint.scheme or "http",
+    )
+
+def publish_geoparquet(vector_path: str, source_sha256: str = None) -> str:
+    """
+    Store a GeoParquet conversion of vector_path in MinIO unless one already exists.
+    Batches are streamed from the source straight into a multipart upload, nothing is
+    written to local disk. Returns the object key.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from pyproj import CRS
+    from shared.postgres_data_management import open_vector_arrow
+
+    key = _normalized_key(vector_path, source_sha256)
+    s3 = s3_client()
+    _ensure_bucket(s3)
+    if _exists(s3, key):
+        return key
+
+    # written under a temporary key and copied once complete, so a failed run never
+    # leaves a truncated artifact behind
+    tmp_key = f"tmp/{uuid.uuid4().hex}.parquet"
+    try:
+        with open_vector_arrow(vector_path) as (geometry_name, crs, batches), \
+                _arrow_s3().open_output_stream(f"{ARTIFACT_BUCKET}/{tmp_key}") as out:
+            writer = None
+            for batch in batches:
+                table = pa.Table.from_batches([batch])
+                table = table.rename_columns(["geometry" if c == geometry_name else c for c in table.column_names])
+                if writer is None:
+                    geo = {
+                        "version": "1.0.0",
+                        "primary_column": "geometry",
+                        "columns": {"geometry": {
+                            "encoding": "WKB",
+                            "geometry_types": [],
+                            "crs": CRS.from_user_input(crs).to_json_dict() if crs else None,
+                        }},
+                    }
+                    schema = table.schema.with_metadata({b"geo": json.dumps(geo).encode()})
+                    writer = pq.ParquetWriter(out, schema, compression="zstd")
+                writer.write_table(table.replace_schema_metadata(schema.metadata))
+            if writer is None:
+                raise ValueError(f"No features in {vector_path}")
+            writer.close()
+        s3.copy({"Bucket": ARTIFACT_BUCKET, "Key": tmp_key}, ARTIFACT_BUCKET, key, Config=TRANSFER_CONFIG)
+    finally:
+        s3.delete_object(Bucket=ARTIFACT_BUCKET, Key=tmp_key)
+    return key
+
+def try_publish_geoparquet(vector_path: str, source_sha256: str = None):
+    """
+    publish_geoparquet as a best-effort cache fill: the data is already loaded from the
+    source, so a failed conversion or upload is logged and leaves the run successful.
+    Returns the object key, or None when nothing was published.
+    """
+    try:
+        return publish_geoparquet(vector_path, source_sha256)
+    except Exception:
+        log.exception("could not publish a GeoParquet conversion of %s", vector_path)
+        return None
@@ -1,6 +1,9 @@
 import requests
 import gzip
 import os
+import sys
+import py7zr
+from py7zr.io import BytesIOFactory
 
 def download_file(url: str, destination_path: str) -> str:
     """
@@ -39,3 +42,62 @@ def unzip_gz_file(source_path: str, destination_path: str) -> str:
         with open(destination_path, 'wb') as f_out:
             f_out.write(f_in.read())
     return os.path.abspath(destination_path)
+
+
+def as_bool(value) -> bool:
+    # templated op_kwargs arrive as strings
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+    return bool(value)
+
+def vsi_path(archive_path: str, member: str = None) -> str:
+    """
+    Build a GDAL virtual file system path that reads straight out of a compressed file,
+    e.g. /vsigzip/data.gpkg.gz or /vsizip/data.zip/layer.shp.
+    /vsi7z/ paths are resolved by load_vector_to_postgis through py7zr.
+    """
+    p = os.path.abspath(archive_path)
+    lower = p.lower()
+    if lower.endswith(".zip"):
+        prefix = "/vsizip/"
+    elif lower.endswith((".tar", ".tar.gz", ".tgz")):
+        prefix = "/vsitar/"
+    elif lower.endswith(".7z"):
+        prefix = "/vsi7z/"
+    elif lower.endswith(".gz"):
+        return f"/vsigzip/{p}"
+    else:
+        raise ValueError(f"Unsupported archive type: {archive_path}")
+    return f"{prefix}{p}/{member}" if member else f"{prefix}{p}"
+
+def gz_source(source_path: str, destination_path: str, extract_to_disk=False) -> str:
+    """
+    Return a path to the content of a .gz file readable by GDAL.
+    By default the file is read in place through /vsigzip/; with extract_to_disk
+    it is unzipped to destination_path first.
+    """
+    if as_bool(extract_to_disk):
+        return unzip_gz_file(source_path, destination_path)
+    return vsi_path(source_path)
+
+def read_7z_members(archive_path: str, target_base: str, extensions: set) -> dict:
+    """
+    Decompress the archive members starting with target_base and having one of
+    the given extensions into memory. Returns a mapping name -> bytes.
+    """
+    with py7zr.SevenZipFile(archive_path, mode='r') as archive:
+        targets = [
+            f for f in archive.getnames()
+            if f.startswith(target_base) and os.path.splitext(f)[1].lower() in extensions
+        ]
+        if not targets:
+            raise ValueError(f"{target_base} not found in archive {archive_path}")
+        # py7zr >= 1.0 writes extracted members through a factory; no size cap here
+        factory = BytesIOFactory(limit=sys.maxsize)
+        archive.extract(targets=targets, factory=factory)
+    members = {}
+    for name in targets:
+        product = factory.get(name)
+        product.seek(0)
+        members[name] = product.read()
+    return members
@@ -1,21 +1,129 @@
 import geopandas as gpd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from pyogrio.raw import open_arrow
 import sqlalchemy
+import zipfile
+import json
+from contextlib import contextmanager
+import io
 import os
+from shared.files_management import read_7z_members
 
-def load_vector_to_postgis(vector_path: str, table_name: str, schema: str = "public"):
+SHAPEFILE_EXTENSIONS = {'.shp', '.shx', '.dbf', '.prj', '.cpg'}
+# Features read from the source and written to PostGIS per step
+LOAD_BATCH_SIZE = int(os.getenv("LOAD_BATCH_SIZE", "50000"))
+
+def _open_7z_vector(vsi7z_path: str) -> io.BytesIO:
+    # /vsi7z/<archive>.7z/<member>: decompress the member (and shapefile sidecars)
+    # in memory and hand them to GDAL as an uncompressed in-memory zip
+    archive_path, member = vsi7z_path[len("/vsi7z/"):].split(".7z/", 1)
+    archive_path += ".7z"
+    base, ext = os.path.splitext(member)
+    extensions = SHAPEFILE_EXTENSIONS if ext.lower() == ".shp" else {ext.lower()}
+    members = read_7z_members(archive_path, base, extensions)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zf:
+        for name, data in members.items():
+            zf.writestr(os.path.basename(name), data)
+    buffer.seek(0)
+    return buffer
+
+def source_file(vector_path: str) -> str:
+    # underlying file of a GDAL virtual file system path, e.g. /vsigzip/a.gpkg.gz -> a.gpkg.gz
+    if not vector_path.startswith("/vsi"):
+        return vector_path
+    path = vector_path.split("/", 2)[2]
+    for ext in (".zip", ".7z", ".tar.gz", ".tgz", ".tar"):
+        if ext + "/" in path:
+            return path.split(ext + "/", 1)[0] + ext
+    return path
+
+def _batch_to_gdf(table, geometry_name: str, crs) -> gpd.GeoDataFrame:
+    df = table.drop_columns([geometry_name]).to_pandas()
+    geometry = gpd.GeoSeries.from_wkb(table.column(geometry_name).to_numpy(zero_copy_only=False), crs=crs)
+    return gpd.GeoDataFrame(df, geometry=geometry.values, crs=crs)
+
+def _sql_dtypes(schema: pa.Schema, geometry_name: str) -> dict:
+    # attribute column types taken from the source schema rather than inferred by pandas from
+    # the first batch, so a value in a column that started all-null still fits the table
+    dtypes = {}
+    for field in schema:
+        if field.name == geometry_name:
+            continue
+        if pa.types.is_boolean(field.type):
+            dtypes[field.name] = sqlalchemy.Boolean()
+        elif pa.types.is_integer(field.type):
+            dtypes[field.name] = sqlalchemy.BigInteger()
+        elif pa.types.is_floating(field.type) or pa.types.is_decimal(field.type):
+            dtypes[field.name] = sqlalchemy.Float(precision=53)
+        elif pa.types.is_timestamp(field.type):
+            dtypes[field.name] = sqlalchemy.DateTime(timezone=field.type.tz is not None)
+        elif pa.types.is_date(field.type):
+            dtypes[field.name] = sqlalchemy.Date()
+        elif pa.types.is_binary(field.type) or pa.types.is_large_binary(field.type):
+            dtypes[field.name] = sqlalchemy.LargeBinary()
+        else:
+            dtypes[field.name] = sqlalchemy.Text()
+    return dtypes
+
+@contextmanager
+def open_vector_arrow(vector_path: str, batch_size: int = LOAD_BATCH_SIZE):
+    """
+    Open a vector file, GeoParquet file or GDAL virtual file system path as a stream of Arrow
+    record batches of at most batch_size features with a WKB geometry column.
+    Yields (geometry column name, crs, batches).
+    """
+    if vector_path.lower().endswith(".parquet"):
+        pf = pq.ParquetFile(vector_path)
+        geo = json.loads(pf.schema_arrow.metadata[b"geo"])
+        geometry_name = geo["primary_column"]
+        yield geometry_name, geo["columns"][geometry_name].get("crs", "OGC:CRS84"), pf.iter_batches(batch_size=batch_size)
+        return
+
+    source = _open_7z_vector(vector_path) if vector_path.startswith("/vsi7z/") else vector_path
+    with open_arrow(source, batch_size=batch_size, use_pyarrow=True) as (meta, reader):
+        yield meta["geometry_name"] or "wkb_geometry", meta["crs"], reader
+
+def iter_vector_batches(vector_path: str, batch_size: int = LOAD_BATCH_SIZE):
+    """
+    Read a vector source (see open_vector_arrow) as a sequence of GeoDataFrames of at most
+    batch_size features, so sources never have to fit in memory.
+    """
+    with open_vector_arrow(vector_path, batch_size) as (geometry_name, crs, batches):
+        for batch in batches:
+            yield _batch_to_gdf(batch, geometry_name, crs)
+
+def load_vector_to_postgis(vector_path: str, table_name: str, schema: str = "public", chunksize: int = 10000):
     """
     Load a vector file (e.g., shapefile, GeoJSON) into a PostGIS table.
+    vector_path may be a GDAL virtual file system path (/vsigzip/, /vsizip/, /vsitar/, /vsi7z/)
+    so compressed sources are read without writing a decompressed copy to disk, or a GeoParquet file.
+    The source is streamed in batches of LOAD_BATCH_SIZE features, all written in one transaction.
     """
-    if not vector_path or not os.path.exists(vector_path):
+    if not vector_path or not os.path.exists(source_file(vector_path)):
         raise FileNotFoundError(f"Vector file not found: {vector_path}")
-    gdf = gpd.read_file(vector_path)
 
     db_url = os.getenv("AIRFLOW__DATABASE__SQL_ALCHEMY_CONN")
     if not db_url:
         raise RuntimeError("Database URL not found in environment")
 
     engine = sqlalchemy.create_engine(db_url)
-    gdf.to_postgis(table_name, engine, if_exists="replace", index=False, schema=schema)
+    with engine.begin() as connection, \
+            open_vector_arrow(vector_path) as (geometry_name, crs, batches):
+        created = False
+        for batch in batches:
+            gdf = _batch_to_gdf(batch, geometry_name, crs)
+            if not created:
+                # the table is created from an empty frame: geopandas types the geometry column
+                # from the data it is given, and a first batch of Polygons alone would make
+                # the column reject the MultiPolygons of a later batch
+                gdf.iloc[:0].to_postgis(table_name, connection, if_exists="replace", index=False, schema=schema,
+                                        dtype=_sql_dtypes(batch.schema, geometry_name))
+                created = True
+            gdf.to_postgis(table_name, connection, if_exists="append", index=False, schema=schema, chunksize=chunksize)
+        if not created:
+            raise ValueError(f"No features in {vector_path}")
 
 def run_sql_script(script_path: str):
     """
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# DAG modules import each other as top-level packages (shared.*), like Airflow's dags folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
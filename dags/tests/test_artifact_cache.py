@@ -0,0 +1,229 @@
+import hashlib
+import json
+
+import boto3
+import pytest
+import requests
+from moto import mock_aws
+
+from shared import artifact_cache
+
+URL = "https://example.org/data/source.gpkg.gz"
+
+
+class FakeResponse:
+    def __init__(self, content: bytes = b"", headers: dict = None):
+        self.content = content
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+
+class Upstream:
+    """
+    Stand-in for the HTTP server publishing a source; counts full downloads.
+    """
+
+    def __init__(self, content: bytes, etag: str = None, last_modified: str = None):
+        self.content = content
+        self.etag = etag
+        self.last_modified = last_modified
+        self.downloads = 0
+        self.head_fails = False
+        self.get_fails = False
+
+    def _headers(self):
+        headers = {}
+        if self.etag:
+            headers["ETag"] = self.etag
+        if self.last_modified:
+            headers["Last-Modified"] = self.last_modified
+        return headers
+
+    def head(self, url, **kwargs):
+        if self.head_fails:
+            raise requests.ConnectionError("upstream unreachable")
+        return FakeResponse(headers=self._headers())
+
+    def get(self, url, **kwargs):
+        if self.get_fails:
+            raise requests.ConnectionError("upstream unreachable")
+        self.downloads += 1
+        return FakeResponse(self.content, self._headers())
+
+
+class FakeTaskInstance:
+    def __init__(self):
+        self.xcom = {}
+
+    def xcom_push(self, key, value):
+        self.xcom[key] = value
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    # moto answers on the default AWS endpoint, not on the MinIO one
+    monkeypatch.setattr(artifact_cache, "MINIO_ENDPOINT", None)
+    with mock_aws():
+        yield boto3.client("s3")
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    server = Upstream(b"kontur population v1" * 1000, etag='"v1"')
+    monkeypatch.setattr(artifact_cache.requests, "head", server.head)
+    monkeypatch.setattr(artifact_cache.requests, "get", server.get)
+    return server
+
+
+def _keys(s3, prefix):
+    listing = s3.list_objects_v2(Bucket=artifact_cache.ARTIFACT_BUCKET, Prefix=prefix)
+    return [o["Key"] for o in listing.get("Contents", [])]
+
+
+def test_miss_downloads_and_stores_by_content_hash(s3, upstream, tmp_path):
+    ti = FakeTaskInstance()
+    path = artifact_cache.cached_download(URL, str(tmp_path / "source.gpkg.gz"), ti=ti)
+
+    sha = hashlib.sha256(upstream.content).hexdigest()
+    assert open(path, "rb").read() == upstream.content
+    assert upstream.downloads == 1
+    assert ti.xcom["sha256"] == sha
+    assert _keys(s3, "sources/") == [f"sources/{sha}"]
+    entry = json.loads(s3.get_object(Bucket=artifact_cache.ARTIFACT_BUCKET,
+                                     Key=artifact_cache._url_key(URL))["Body"].read())
+    assert (entry["sha256"], entry["etag"], entry["size"]) == (sha, '"v1"', len(upstream.content))
+
+
+def test_hit_is_served_from_the_cache(s3, upstream, tmp_path):
+    artifact_cache.cached_download(URL, str(tmp_path / "first.gpkg.gz"))
+    ti = FakeTaskInstance()
+    path = artifact_cache.cached_download(URL, str(tmp_path / "second.gpkg.gz"), ti=ti)
+
+    assert upstream.downloads == 1
+    assert open(path, "rb").read() == upstream.content
+    assert ti.xcom["sha256"] == hashlib.sha256(upstream.content).hexdigest()
+
+
+def test_etag_change_downloads_the_new_content(s3, upstream, tmp_path):
+    artifact_cache.cached_download(URL, str(tmp_path / "v1.gpkg.gz"))
+    upstream.content, upstream.etag = b"kontur population v2" * 1000, '"v2"'
+    path = artifact_cache.cached_download(URL, str(tmp_path / "v2.gpkg.gz"))
+
+    assert upstream.downloads == 2
+    assert open(path, "rb").read() == upstream.content
+    assert len(_keys(s3, "sources/")) == 2
+
+
+def test_same_content_under_a_new_etag_is_stored_once(s3, upstream, tmp_path):
+    artifact_cache.cached_download(URL, str(tmp_path / "a.gpkg.gz"))
+    upstream.etag = '"republished"'
+    artifact_cache.cached_download(URL, str(tmp_path / "b.gpkg.gz"))
+
+    assert upstream.downloads == 2
+    assert len(_keys(s3, "sources/")) == 1
+
+
+def test_sources_without_version_headers_are_always_downloaded(s3, upstream, tmp_path):
+    upstream.etag = None
+    artifact_cache.cached_download(URL, str(tmp_path / "a.gpkg.gz"))
+    artifact_cache.cached_download(URL, str(tmp_path / "b.gpkg.gz"))
+
+    assert upstream.downloads == 2
+
+
+def test_failed_head_downloads_again(s3, upstream, tmp_path):
+    artifact_cache.cached_download(URL, str(tmp_path / "a.gpkg.gz"))
+    upstream.head_fails = True
+    path = artifact_cache.cached_download(URL, str(tmp_path / "b.gpkg.gz"))
+
+    assert upstream.downloads == 2
+    assert open(path, "rb").read() == upstream.content
+
+
+def test_unreachable_upstream_is_served_from_the_last_cached_copy(s3, upstream, tmp_path):
+    artifact_cache.cached_download(URL, str(tmp_path / "a.gpkg.gz"))
+    upstream.head_fails = upstream.get_fails = True
+    ti = FakeTaskInstance()
+    path = artifact_cache.cached_download(URL, str(tmp_path / "b.gpkg.gz"), ti=ti)
+
+    assert upstream.downloads == 1
+    assert open(path, "rb").read() == upstream.content
+    assert ti.xcom["sha256"] == hashlib.sha256(upstream.content).hexdigest()
+
+
+def test_unreachable_upstream_without_cached_copy_fails(s3, upstream, tmp_path):
+    upstream.head_fails = upstream.get_fails = True
+    with pytest.raises(requests.ConnectionError):
+        artifact_cache.cached_download(URL, str(tmp_path / "a.gpkg.gz"))
+
+
+def test_cached_geoparquet_falls_back_to_the_source_on_a_miss(s3, tmp_path):
+    source = tmp_path / "source.gpkg.gz"
+    source.write_bytes(b"not parsed on a miss")
+    vector_path = f"/vsigzip/{source}"
+
+    # the hash comes from cached_download through XCom; templated misses render as "None"
+    assert artifact_cache.cached_geoparquet(vector_path, str(tmp_path / "out.parquet"), "abc") == vector_path
+    assert artifact_cache.cached_geoparquet(vector_path, str(tmp_path / "out.parquet"), "None") == vector_path
+
+
+@pytest.fixture
+def minio(monkeypatch):
+    # S3 API over HTTP, reachable from both boto3 and pyarrow's S3 filesystem
+    from moto.server import ThreadedMotoServer
+
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+    server.start()
+    host, port = server.get_host_and_port()
+    monkeypatch.setattr(artifact_cache, "MINIO_ENDPOINT", f"http://{host}:{port}")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("AWS_EC2_METADATA_DISABLED", "true")
+    monkeypatch.setenv("MINIO_ACCESS_KEY", "testing")
+    monkeypatch.setenv("MINIO_SECRET_KEY", "testing")
+    yield artifact_cache.s3_client()
+    server.stop()
+
+
+def test_published_geoparquet_is_used_on_the_next_run(minio, tmp_path):
+    gpd = pytest.importorskip("geopandas")
+    from shapely.geometry import Point
+    from shared.postgres_data_management import iter_vector_batches
+
+    source = tmp_path / "population.gpkg"
+    gpd.GeoDataFrame(
+        {"h3": [f"cell{i}" for i in range(30)], "population": range(30)},
+        geometry=[Point(i / 10, 45 + i / 10) for i in range(30)],
+        crs=4326,
+    ).to_file(source)
+    vector_path = str(source)
+
+    key = artifact_cache.publish_geoparquet(vector_path, "sha-of-download")
+    assert _keys(minio, "normalized/") == [key]
+    assert _keys(minio, "tmp/") == []
+
+    local = artifact_cache.cached_geoparquet(vector_path, str(tmp_path / "cached.parquet"), "sha-of-download")
+    assert local.endswith("cached.parquet")
+    batches = list(iter_vector_batches(local, batch_size=20))
+    assert [len(b) for b in batches] == [20, 10]
+    assert batches[0].crs.to_epsg() == 4326
+    assert batches[1]["population"].tolist() == list(range(20, 30))
+
+
+def test_try_publish_geoparquet_does_not_fail_the_run(s3, tmp_path):
+    assert artifact_cache.try_publish_geoparquet(str(tmp_path / "missing.gpkg"), source_sha256="0" * 64) is None
+    assert _keys(s3, "normalized/") == []
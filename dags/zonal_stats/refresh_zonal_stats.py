@@ -0,0 +1,27 @@
+from airflow import DAG
+from airflow.operators.python import PythonOperator
+from shared.postgres_data_management import run_sql_script
+from datetime import datetime
+
+default_args = {
+    'start_date': datetime(2025, 1, 2),
+}
+
+# Post-load stage: triggered by the communes, population and BD Foret DAGs, and run
+# periodically to fold in the dirty extents queued by the streaming feature consumer
+# (a run with nothing queued and no layer change is a no-op)
+with DAG(
+    'refresh_zonal_stats',
+    default_args=default_args,
+    schedule_interval='*/10 * * * *',
+    catchup=False,
+    max_active_runs=1,
+) as dag:
+
+    refresh_task = PythonOperator(
+        task_id='refresh_zonal_stats',
+        python_callable=run_sql_script,
+        op_kwargs={
+            'script_path': '/opt/airflow/dags/zonal_stats/sql/refresh_zonal_stats.sql',
+        },
+    )
@@ -0,0 +1,208 @@
+-- refresh precomputed population / forest statistics per commune and per H3 parent cell.
+-- Only the parts whose source layer changed since the last run are recomputed:
+--   * a batch reload (zonal_stats_dirty row without extent, or no dirty row at all)
+--     recomputes every unit of the affected statistics;
+--   * streamed changes (dirty extents queued by the feature consumer) recompute only
+--     the units intersecting those extents.
+-- Runs on one snapshot, so changes committed meanwhile are left for the next run.
+begin transaction isolation level repeatable read;
+
+create table if not exists zonal_stats (
+    unit_type        text   not null,
+    unit_id          text   not null,
+    name             text,
+    geom             geometry(Geometry, 4326) not null,
+    total_population bigint not null default 0,
+    tfv_area_m2      jsonb  not null default '{}'::jsonb,
+    updated_at       timestamptz default now(),
+    primary key (unit_type, unit_id)
+);
+create index if not exists idx_zonal_stats_geom on zonal_stats using gist (geom);
+
+create table if not exists zonal_stats_sources (
+    public_id     varchar(50) primary key,
+    layer_version timestamptz
+);
+
+create table if not exists zonal_stats_dirty (
+    id       bigserial primary key,
+    layer_id integer not null,
+    extent   geometry(Polygon, 4326)
+);
+
+do $$
+declare
+    h3_res          constant integer := 6;  -- H3 parent resolution of the precomputed cells
+    commune_layer   integer;
+    pop_layer       integer;
+    forest_layer    integer;
+    communes_dirty  boolean := false;
+    pop_mode        text;                   -- null (unchanged) | 'full' | 'extents'
+    forest_mode     text;
+begin
+    select id into commune_layer from layers where public_id = 'communes_administrative_d18';
+    select id into pop_layer     from layers where public_id = 'population_density';
+    select id into forest_layer  from layers where public_id = 'bd_foret_v2';
+
+    select coalesce(l.updated_at is distinct from s.layer_version, false) into communes_dirty
+    from layers l left join zonal_stats_sources s on s.public_id = l.public_id
+    where l.id = commune_layer;
+
+    -- changed layers: 'extents' when every queued change carries an extent, else 'full'
+    select case when bool_and(d.extent is not null) then 'extents' else 'full' end into pop_mode
+    from layers l
+    left join zonal_stats_sources s on s.public_id = l.public_id
+    left join zonal_stats_dirty d on d.layer_id = l.id
+    where l.id = pop_layer
+      and l.updated_at is distinct from s.layer_version;
+    select case when bool_and(d.extent is not null) then 'extents' else 'full' end into forest_mode
+    from layers l
+    left join zonal_stats_sources s on s.public_id = l.public_id
+    left join zonal_stats_dirty d on d.layer_id = l.id
+    where l.id = forest_layer
+      and l.updated_at is distinct from s.layer_version;
+
+    -- units to recompute, per statistic
+    create temp table zs_targets (
+        stat      text not null,  -- 'population' | 'forest'
+        unit_type text not null,
+        unit_id   text not null,
+        primary key (stat, unit_type, unit_id)
+    ) on commit drop;
+
+    -- commune units follow the communes layer
+    if communes_dirty then
+        delete from zonal_stats where unit_type = 'commune';
+        insert into zonal_stats (unit_type, unit_id, name, geom)
+        select 'commune', f.source_id, f.properties->>'nom', f.geom
+        from features f
+        where f.layer_id = commune_layer
+          and f.source_id is not null;
+        insert into zs_targets
+        select stat, 'commune', unit_id
+        from zonal_stats, unnest(array['population', 'forest']) stat
+        where unit_type = 'commune'
+        on conflict do nothing;
+    end if;
+
+    -- H3 units cover every populated parent cell and the forest extent; fresh cells need both statistics
+    if pop_mode is not null or forest_mode is not null then
+        -- extents mode is driven from the queued extents so features are found through the GiST index
+        with cells as (
+            select h3_cell_to_parent(f.source_id::h3index, h3_res) as c
+            from features f
+            where f.layer_id = pop_layer and pop_mode = 'full'
+            union
+            select h3_cell_to_parent(f.source_id::h3index, h3_res)
+            from zonal_stats_dirty d
+            join features f on f.layer_id = pop_layer and f.geom && d.extent
+            where d.layer_id = pop_layer and pop_mode = 'extents'
+            union
+            select h3_polygon_to_cells(ST_Expand(x.e, 0.1), h3_res)
+            from (
+                select ST_SetSRID(ST_Extent(geom)::geometry, 4326) as e
+                from features where layer_id = forest_layer and forest_mode = 'full'
+                union all
+                select extent from zonal_stats_dirty
+                where layer_id = forest_layer and forest_mode = 'extents'
+            ) x
+            where x.e is not null
+        ), added as (
+            insert into zonal_stats (unit_type, unit_id, geom)
+            select 'h3', c::text, h3_cell_to_boundary_geometry(c)
+            from cells
+            on conflict (unit_type, unit_id) do nothing
+            returning unit_id
+        )
+        insert into zs_targets
+        select stat, 'h3', unit_id
+        from added, unnest(array['population', 'forest']) stat
+        on conflict do nothing;
+    end if;
+
+    if pop_mode = 'full' then
+        insert into zs_targets
+        select 'population', z.unit_type, z.unit_id
+        from zonal_stats z
+        on conflict do nothing;
+    elsif pop_mode = 'extents' then
+        insert into zs_targets
+        select distinct 'population', z.unit_type, z.unit_id
+        from zonal_stats_dirty d
+        join zonal_stats z on z.geom && d.extent
+        where d.layer_id = pop_layer
+        on conflict do nothing;
+    end if;
+
+    if forest_mode = 'full' then
+        insert into zs_targets
+        select 'forest', z.unit_type, z.unit_id
+        from zonal_stats z
+        on conflict do nothing;
+    elsif forest_mode = 'extents' then
+        insert into zs_targets
+        select distinct 'forest', z.unit_type, z.unit_id
+        from zonal_stats_dirty d
+        join zonal_stats z on z.geom && d.extent
+        where d.layer_id = forest_layer
+        on conflict do nothing;
+    end if;
+
+    -- population: each hexagon counts in exactly one unit (its H3 parent / the commune holding its centre)
+    update zonal_stats z
+    set total_population = coalesce(p.total, 0), updated_at = now()
+    from zs_targets t
+    left join lateral (
+        select sum((f.properties->>'population')::bigint) as total
+        from zonal_stats u
+        join features f
+          on f.layer_id = pop_layer
+         and f.geom && u.geom
+         and case
+                 when u.unit_type = 'h3' then h3_cell_to_parent(f.source_id::h3index, h3_res)::text = u.unit_id
+                 else ST_Contains(u.geom, ST_PointOnSurface(f.geom))
+             end
+        where u.unit_type = t.unit_type
+          and u.unit_id = t.unit_id
+    ) p on true
+    where t.stat = 'population'
+      and z.unit_type = t.unit_type
+      and z.unit_id = t.unit_id;
+
+    -- forest: exact area of the forest polygons clipped to each unit, per formation type
+    update zonal_stats z
+    set tfv_area_m2 = coalesce(s.tfv_area_m2, '{}'::jsonb), updated_at = now()
+    from zs_targets t
+    left join lateral (
+        select jsonb_object_agg(type, area_m2) as tfv_area_m2
+        from (
+            select lower(f.properties->>'tfv')                               as type,
+                   sum(ST_Area(ST_Intersection(f.geom, u.geom)::geography)) as area_m2
+            from zonal_stats u
+            join features f
+              on f.layer_id = forest_layer
+             and f.geom && u.geom
+             and ST_Intersects(f.geom, u.geom)
+            where u.unit_type = t.unit_type
+              and u.unit_id = t.unit_id
+              and f.properties->>'tfv' is not null
+            group by 1
+        ) a
+    ) s on true
+    where t.stat = 'forest'
+      and z.unit_type = t.unit_type
+      and z.unit_id = t.unit_id;
+
+    -- every queued change visible in this snapshot has been applied
+    delete from zonal_stats_dirty;
+
+    insert into zonal_stats_sources (public_id, layer_version)
+    select public_id, updated_at
+    from layers
+    where id in (commune_layer, pop_layer, forest_layer)
+    on conflict (public_id) do update
+    set layer_version = EXCLUDED.layer_version;
+end
+$$;
+
+commit;
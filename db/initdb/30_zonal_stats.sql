@@ -0,0 +1,26 @@
+-- precomputed zonal statistics, refreshed by the refresh_zonal_stats DAG
+CREATE TABLE IF NOT EXISTS zonal_stats (
+    unit_type        text   NOT NULL,          -- 'commune' | 'h3'
+    unit_id          text   NOT NULL,          -- commune source_id | h3 cell index
+    name             text,
+    geom             geometry(Geometry, 4326) NOT NULL,
+    total_population bigint NOT NULL DEFAULT 0,
+    tfv_area_m2      jsonb  NOT NULL DEFAULT '{}'::jsonb,
+    updated_at       TIMESTAMPTZ DEFAULT now(),
+    PRIMARY KEY (unit_type, unit_id)
+);
+CREATE INDEX IF NOT EXISTS idx_zonal_stats_geom ON zonal_stats USING GIST (geom);
+
+-- layer versions (layers.updated_at) the statistics were last computed from
+CREATE TABLE IF NOT EXISTS zonal_stats_sources (
+    public_id     varchar(50) PRIMARY KEY,
+    layer_version TIMESTAMPTZ
+);
+
+-- changes not yet folded into zonal_stats: extent of streamed changes (feature consumer),
+-- or no extent when a loader replaced the whole layer
+CREATE TABLE IF NOT EXISTS zonal_stats_dirty (
+    id       bigserial PRIMARY KEY,
+    layer_id integer NOT NULL,
+    extent   geometry(Polygon, 4326)
+);
@@ -0,0 +1,42 @@
+-- per-layer summary served by the layer catalog, kept up to date by the loaders
+-- (refresh_layer_summary) and incrementally by the streaming consumer
+ALTER TABLE layers ADD COLUMN IF NOT EXISTS feature_count bigint NOT NULL DEFAULT 0;
+ALTER TABLE layers ADD COLUMN IF NOT EXISTS extent        geometry(Polygon, 4326);
+ALTER TABLE layers ADD COLUMN IF NOT EXISTS h3_resolution smallint;
+
+drop procedure if exists refresh_layer_summary;
+create or replace procedure refresh_layer_summary(layer_ids integer[])
+    language plpgsql
+as
+$$
+begin
+    update layers l
+    set feature_count = s.feature_count,
+        extent        = s.extent,
+        h3_resolution = s.h3_resolution
+    from (
+        select l2.id,
+               coalesce(f.feature_count, 0) as feature_count,
+               f.extent,
+               case when f.h3_cells then h.res end as h3_resolution
+        from unnest(layer_ids) l2(id)
+        left join lateral (
+            select count(*) as feature_count,
+                   ST_MakeEnvelope(ST_XMin(ST_Extent(geom)), ST_YMin(ST_Extent(geom)),
+                                   ST_XMax(ST_Extent(geom)), ST_YMax(ST_Extent(geom)), 4326) as extent,
+                   bool_and(source_id ~ '^8[0-9a-f]{14}$') as h3_cells
+            from features
+            where layer_id = l2.id
+        ) f on true
+        left join lateral (
+            select h3_get_resolution(source_id::h3index)::smallint as res
+            from features
+            where layer_id = l2.id and f.h3_cells
+            limit 1
+        ) h on true
+    ) s
+    where l.id = s.id;
+end;
+$$;
+
+call refresh_layer_summary(array(select id from layers));
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# feature_consumer.py is a standalone script at the service root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
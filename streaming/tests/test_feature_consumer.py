@@ -0,0 +1,175 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import psycopg
+import pytest
+
+import feature_consumer as fc
+
+POINT = {"type": "Point", "coordinates": [2.35, 48.85]}
+
+
+class FakeCursor:
+    """
+    Records what apply_batch sends to Postgres; query results are scripted per SQL statement.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.conn.executed.append((sql, params))
+        failure = self.conn.fail_on(sql, self.conn.staged)
+        if failure:
+            raise failure
+        self._rows = self.conn.results.get(sql, [])
+
+    def fetchall(self):
+        return self._rows
+
+    @contextmanager
+    def copy(self, statement):
+        rows = self.conn.staged.setdefault(statement.split()[1], [])
+        yield SimpleNamespace(write_row=rows.append)
+
+
+class FakeConnection:
+    def __init__(self, results=None, fail_on=lambda sql, staged: None):
+        self.results = results or {}
+        self.fail_on = fail_on
+        self.executed = []
+        self.staged = {}
+        self.transactions = 0
+
+    @contextmanager
+    def transaction(self):
+        self.transactions += 1
+        self.staged = {}
+        yield
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+def _record(value, offset=0):
+    return SimpleNamespace(topic=fc.FEATURES_TOPIC, partition=0, offset=offset, value=value, timestamp=0)
+
+
+def test_coalesce_keeps_last_event_per_feature():
+    events = [
+        {"op": "create", "layer_id": 1, "source_id": "a", "geometry": POINT, "properties": {"v": 1}},
+        {"op": "update", "layer_id": 1, "source_id": "a", "geometry": POINT, "properties": {"v": 2}},
+        {"op": "create", "layer_id": 1, "source_id": "b", "geometry": POINT},
+        {"op": "delete", "layer_id": 1, "source_id": "b"},
+        {"op": "delete", "layer_id": "2", "source_id": 7},
+        {"op": "create", "layer_id": 2, "source_id": "7", "geometry": POINT},
+    ]
+    upserts, deletes = fc.coalesce(events)
+
+    assert [(e["layer_id"], e["source_id"], e.get("properties")) for e in upserts] == [
+        (1, "a", {"v": 2}),
+        (2, "7", None),
+    ]
+    assert deletes == [(1, "b")]
+
+
+def test_apply_batch_stages_then_upserts_deletes_and_bumps_in_order():
+    conn = FakeConnection(results={
+        fc.DIRTY_SQL: [(1, 0.0, 0.0, 3.0, 3.0)],
+        fc.UPSERT_SQL: [(1, 1, False)],
+        fc.DELETE_SQL: [(1, 1), (2, 1)],
+    })
+    events = [
+        {"op": "create", "layer_id": 1, "source_id": "a", "geometry": POINT},
+        {"op": "delete", "layer_id": 1, "source_id": "b"},
+        {"op": "delete", "layer_id": 2, "source_id": "c"},
+    ]
+    dirty = fc.apply_batch(conn, events)
+
+    assert conn.transactions == 1
+    assert [sql for sql, _ in conn.executed] == [
+        fc.STAGE_SQL, fc.DIRTY_SQL, fc.UPSERT_SQL, fc.DELETE_SQL, fc.BUMP_SQL, fc.ZONAL_DIRTY_SQL,
+    ]
+    assert [row[:2] for row in conn.staged["features_stage"]] == [(1, "a")]
+    assert conn.staged["features_stage_del"] == [(1, "b"), (2, "c")]
+
+    bump = conn.executed[-2][1]
+    assert bump["ids"] == [1, 2]
+    # layer 1: one insert, one delete; layer 2: one delete
+    assert bump["deltas"] == [0, -1]
+    assert bump["h3_cells"] == [False, None]
+    assert (bump["xmin"], bump["ymax"]) == ([0.0, None], [3.0, None])
+    # the same extents are queued for the zonal statistics refresh
+    assert conn.executed[-1][1]["xmin"] == [0.0, None]
+    assert dirty == {1: (0.0, 0.0, 3.0, 3.0), 2: None}
+
+
+@pytest.mark.parametrize("event, reason", [
+    ([1, 2], "not a JSON object"),
+    ({"layer_id": 1}, "missing layer_id or source_id"),
+    ({"layer_id": "x", "source_id": "a", "geometry": POINT}, "not an integer"),
+    ({"op": "upsert", "layer_id": 1, "source_id": "a", "geometry": POINT}, "unknown op"),
+    ({"op": "create", "layer_id": 1, "source_id": "a"}, "without a GeoJSON geometry"),
+    ({"op": "update", "layer_id": 1, "source_id": "a", "geometry": "POINT(0 0)"}, "without a GeoJSON geometry"),
+])
+def test_validate_event_rejects_malformed_events(event, reason):
+    assert reason in fc.validate_event(event)
+
+
+def test_validate_event_accepts_deletes_without_geometry():
+    assert fc.validate_event({"op": "delete", "layer_id": 1, "source_id": "a"}) is None
+
+
+@pytest.mark.parametrize("raw, reason", [
+    (b"not json", "not JSON"),
+    (b"\xff\xfe\x00garbage", "not JSON"),
+    (b"", "not a JSON object"),
+    (None, "not a JSON object"),
+    (b'{"layer_id": 1}', "missing layer_id or source_id"),
+])
+def test_parse_event_reports_undecodable_values_instead_of_raising(raw, reason):
+    event, error = fc.parse_event(raw)
+    assert event is None
+    assert reason in error
+
+
+def test_parse_event_decodes_valid_events():
+    raw = b'{"op": "delete", "layer_id": 1, "source_id": "a"}'
+    assert fc.parse_event(raw) == ({"op": "delete", "layer_id": 1, "source_id": "a"}, None)
+
+
+def test_apply_one_by_one_dead_letters_rejected_events_and_keeps_order():
+    def fail_on(sql, staged):
+        # the database rejects feature "bad" (e.g. unknown layer / invalid GeoJSON)
+        if sql == fc.UPSERT_SQL and any(row[1] == "bad" for row in staged.get("features_stage", [])):
+            return psycopg.errors.ForeignKeyViolation("unknown layer")
+
+    conn = FakeConnection(results={fc.DIRTY_SQL: [(1, 0.0, 0.0, 1.0, 1.0)]}, fail_on=fail_on)
+    records = [
+        _record({"op": "create", "layer_id": 1, "source_id": "a", "geometry": POINT}, 0),
+        _record({"op": "create", "layer_id": 1, "source_id": "bad", "geometry": POINT}, 1),
+        _record({"op": "delete", "layer_id": 1, "source_id": "a"}, 2),
+    ]
+    dead = []
+    dirty = fc.apply_one_by_one(conn, records, lambda r, error: dead.append((r.offset, error)))
+
+    assert dead == [(1, "unknown layer")]
+    assert conn.transactions == 3
+    # the delete of "a" is applied after its create
+    statements = [sql for sql, _ in conn.executed if sql in (fc.UPSERT_SQL, fc.DELETE_SQL)]
+    assert statements == [fc.UPSERT_SQL, fc.DELETE_SQL, fc.UPSERT_SQL, fc.UPSERT_SQL, fc.DELETE_SQL]
+    assert dirty == {1: (0.0, 0.0, 1.0, 1.0)}
+
+
+def test_apply_one_by_one_propagates_connection_errors():
+    conn = FakeConnection(fail_on=lambda sql, staged: psycopg.OperationalError("server closed the connection"))
+    with pytest.raises(psycopg.OperationalError):
+        fc.apply_one_by_one(conn, [_record({"op": "delete", "layer_id": 1, "source_id": "a"})],
+                            lambda r, error: pytest.fail("connection errors must not be dead-lettered"))
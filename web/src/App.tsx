@@ -127,9 +127,11 @@ const App = () => {
     const onClick = (e: maplibregl.MapMouseEvent & maplibregl.EventData) => {
       if (!selectedLayer) return
 
-      const features = map.queryRenderedFeatures(e.point, {
-        layers: [`lyr-${selectedLayer}-fill`, `lyr-${selectedLayer}-line`, `lyr-${selectedLayer}-circle`]
-      })
+      // H3 layers only have a fill layer; MapLibre returns nothing if any listed layer is missing
+      const layers = [`lyr-${selectedLayer}-fill`, `lyr-${selectedLayer}-line`, `lyr-${selectedLayer}-circle`]
+        .filter(l => map.getLayer(l))
+      if (layers.length === 0) return
+      const features = map.queryRenderedFeatures(e.point, { layers })
 
       if (features.length > 0) {
         const feature = features[0]
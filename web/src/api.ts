@@ -40,6 +40,20 @@ export function mvtUrlFor(layerId: number) {
   return `${API_BASE}/tiles/layer/${layerId}/{z}/{x}/{y}.mvt`;
 }
 
+export function h3TileUrlFor(layerId: number, z: number, x: number, y: number) {
+  return `${API_BASE}/tiles/layer/${layerId}/${z}/${x}/${y}.h3`;
+}
+
+export async function fetchH3Tile(layerId: number, z: number, x: number, y: number): Promise<ArrayBuffer> {
+  const t = getToken();
+  const r = await fetch(h3TileUrlFor(layerId, z, x, y), {
+    credentials: 'include',
+    headers: t ? { Authorization: `Bearer ${t}` } : {}
+  });
+  if (!r.ok) throw new Error(`h3 tile failed: ${r.status}`);
+  return r.arrayBuffer();
+}
+
 export async function saveMapState(state: MapState): Promise<void> {
   await fetch(`${API_BASE}/auth/me/map-state`, {
     method: 'PUT',
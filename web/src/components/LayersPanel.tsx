@@ -1,6 +1,7 @@
 import { useEffect, useMemo, useRef, useState } from 'react'
 import maplibregl from 'maplibre-gl'; // Change from 'import type' to regular import
 import { fetchLayers, mvtUrlFor, logout } from '../api'
+import { addH3Source, removeH3Source } from '../h3tiles'
 import type { DbLayer, User } from '../types'
 
 type Props = {
@@ -20,8 +21,40 @@ function colorFor(id: number) {
   return `hsl(${h} 60% 55%)`
 }
 
-function ensureLayerAdded(map: maplibregl.Map, id: number) {
+// [minLng, minLat, maxLng, maxLat] of the layer extent, used to skip tiles outside it
+function boundsOf(bbox: DbLayer['bbox']): [number, number, number, number] | undefined {
+  if (!bbox) return undefined
+  const flat = (c: any): number[][] => typeof c[0] === 'number' ? [c] : c.flatMap(flat)
+  const pts = flat(bbox.coordinates)
+  if (!pts.length) return undefined
+  const xs = pts.map(p => p[0]), ys = pts.map(p => p[1])
+  return [Math.min(...xs), Math.min(...ys), Math.max(...xs), Math.max(...ys)]
+}
+
+function ensureLayerAdded(map: maplibregl.Map, layer: DbLayer) {
+  const id = layer.id
   const src = `src-${id}`
+  // Layers without features have no zoom range: nothing to fetch
+  if (layer.max_zoom === null) return
+  if (!map.getSource(src) && layer.h3_resolution != null) {
+    // H3 layers come as compact cell tiles, hexagons are rebuilt client-side
+    const beforeId = map.getLayer('labels') ? 'labels' : undefined
+    addH3Source(map, src, layer)
+    map.addLayer(
+      {
+        id: `lyr-${id}-fill`,
+        type: 'fill',
+        source: src,
+        paint: {
+          'fill-color': colorFor(id),
+          // value per km², so the ramp holds at every zoom / H3 resolution
+          'fill-opacity': ['interpolate', ['linear'], ['get', 'density'], 0, 0.05, 5000, 0.75]
+        }
+      },
+      beforeId
+    )
+    return
+  }
   if (!map.getSource(src)) {
     // Ensure the tile template remains unchanged, only remove ?token= if it exists
     const raw = mvtUrlFor(id)
@@ -29,7 +62,13 @@ function ensureLayerAdded(map: maplibregl.Map, id: number) {
 
     const beforeId = map.getLayer('labels') ? 'labels' : undefined
 
-    map.addSource(src, { type: 'vector', tiles: [tilesUrl], minzoom: 0, maxzoom: 22 })
+    map.addSource(src, {
+      type: 'vector',
+      tiles: [tilesUrl],
+      minzoom: layer.min_zoom ?? 0,
+      maxzoom: layer.max_zoom ?? 22,
+      bounds: boundsOf(layer.bbox)
+    })
 
     // Polygons
     map.addLayer(
@@ -90,6 +129,7 @@ function removeLayer(map: maplibregl.Map, id: number) {
     if (map.getLayer(lid)) map.removeLayer(lid)
   }
   const src = `src-${id}`
+  removeH3Source(map, src)
   if (map.getSource(src)) map.removeSource(src)
 }
 
@@ -118,7 +158,7 @@ export default function LayersPanel({ map, user, onLogout, initialState, onState
     for (const r of rows) {
       const st = init[r.id]
       if (st?.enabled) {
-        ensureLayerAdded(map, r.id)
+        ensureLayerAdded(map, r)
         setLayerVisibility(map, r.id, st.visible !== false)
       }
     }
@@ -135,9 +175,11 @@ export default function LayersPanel({ map, user, onLogout, initialState, onState
     }
 
     // Query features from the selected layer
-    const features = map.queryRenderedFeatures(e.point, {
-      layers: [`lyr-${selectedLayer}-fill`, `lyr-${selectedLayer}-line`, `lyr-${selectedLayer}-circle`]
-    })
+    // H3 layers only have a fill layer; MapLibre returns nothing if any listed layer is missing
+    const layers = [`lyr-${selectedLayer}-fill`, `lyr-${selectedLayer}-line`, `lyr-${selectedLayer}-circle`]
+      .filter(l => map.getLayer(l))
+    if (layers.length === 0) return
+    const features = map.queryRenderedFeatures(e.point, { layers })
 
     console.log("Queried features:", features) // Debugging log
 
@@ -202,7 +244,7 @@ export default function LayersPanel({ map, user, onLogout, initialState, onState
                       setState(prev=>{
                         const cur = prev[r.id] ?? { enabled:false, visible:true }
                         const next = { ...cur, enabled: !cur.enabled }
-                        if (next.enabled) { ensureLayerAdded(map, r.id); setLayerVisibility(map, r.id, cur.visible) }
+                        if (next.enabled) { ensureLayerAdded(map, r); setLayerVisibility(map, r.id, cur.visible) }
                         else { removeLayer(map, r.id) }
                         return { ...prev, [r.id]: next }
                       })
@@ -0,0 +1,114 @@
+import type maplibregl from 'maplibre-gl'
+import { cellArea, cellToBoundary, UNITS } from 'h3-js'
+import { fetchH3Tile } from './api'
+import type { DbLayer } from './types'
+
+// Compact H3 tiles (see backend app/h3_tiles.py): sorted cell indexes + float32 values.
+// Hexagons are rebuilt here and fed to a GeoJSON source kept in sync with the viewport.
+
+const HEADER_BYTES = 24
+const MAX_CACHED_TILES = 256
+
+export interface H3Tile {
+  res: number
+  cells: string[]
+  values: Float32Array
+}
+
+export function decodeH3Tile(buf: ArrayBuffer): H3Tile {
+  const dv = new DataView(buf)
+  const magic = String.fromCharCode(...new Uint8Array(buf, 0, 4))
+  if (magic !== 'H3T1') throw new Error('not an H3 tile')
+  const res = dv.getUint8(4)
+  const width = dv.getUint8(5)
+  const n = dv.getUint32(8, true)
+  if (!n) return { res, cells: [], values: new Float32Array(0) }
+
+  const deltas = width === 2 ? new Uint16Array(buf, HEADER_BYTES, n - 1)
+    : width === 4 ? new Uint32Array(buf, HEADER_BYTES, n - 1)
+    : new BigUint64Array(buf, HEADER_BYTES, n - 1)
+  const valuesOffset = HEADER_BYTES + Math.ceil(((n - 1) * width) / 8) * 8
+  const values = new Float32Array(buf, valuesOffset, n)
+
+  const cells = new Array<string>(n)
+  let cur = dv.getBigUint64(16, true)
+  cells[0] = cur.toString(16)
+  for (let i = 1; i < n; i++) {
+    cur += BigInt(deltas[i - 1])
+    cells[i] = cur.toString(16)
+  }
+  return { res, cells, values }
+}
+
+function tileFeatures(tile: H3Tile): GeoJSON.Feature[] {
+  return tile.cells.map((h3, i) => {
+    const ring = cellToBoundary(h3, true)
+    ring.push(ring[0])
+    return {
+      type: 'Feature',
+      geometry: { type: 'Polygon', coordinates: [ring] },
+      // density keeps the styling comparable across resolutions: parent cells sum their children
+      properties: { h3, value: tile.values[i], density: tile.values[i] / cellArea(h3, UNITS.km2) }
+    }
+  })
+}
+
+// First zoom at which the backend serves the layer's native resolution
+// (inverse of h3_resolution_for_zoom); deeper tiles would only repeat the same cells
+function h3NativeZoom(res: number): number {
+  return Math.ceil(res / 0.75) + 1
+}
+
+// Tiles of the integer zoom covering the current viewport
+function tilesInView(map: maplibregl.Map, maxZoom: number): [number, number, number][] {
+  const z = Math.max(0, Math.min(maxZoom, Math.floor(map.getZoom())))
+  const n = 2 ** z
+  const b = map.getBounds()
+  const clamp = (v: number) => Math.max(0, Math.min(n - 1, v))
+  const lon2x = (lon: number) => clamp(Math.floor(((lon + 180) / 360) * n))
+  const lat2y = (lat: number) => {
+    const r = (Math.max(-85.0511, Math.min(85.0511, lat)) * Math.PI) / 180
+    return clamp(Math.floor(((1 - Math.log(Math.tan(r) + 1 / Math.cos(r)) / Math.PI) / 2) * n))
+  }
+  const out: [number, number, number][] = []
+  for (let x = lon2x(b.getWest()); x <= lon2x(b.getEast()); x++)
+    for (let y = lat2y(b.getNorth()); y <= lat2y(b.getSouth()); y++) out.push([z, x, y])
+  return out
+}
+
+const handlers = new Map<string, () => void>()
+
+export function addH3Source(map: maplibregl.Map, src: string, layer: DbLayer) {
+  const cache = new Map<string, GeoJSON.Feature[]>()
+  let generation = 0
+
+  map.addSource(src, { type: 'geojson', data: { type: 'FeatureCollection', features: [] } })
+
+  const sync = async () => {
+    const gen = ++generation
+    const tiles = tilesInView(map, h3NativeZoom(layer.h3_resolution ?? 15))
+    const parts = await Promise.all(tiles.map(async ([z, x, y]) => {
+      const key = `${z}/${x}/${y}`
+      let feats = cache.get(key)
+      if (!feats) {
+        try { feats = tileFeatures(decodeH3Tile(await fetchH3Tile(layer.id, z, x, y))) }
+        catch { return [] }
+        cache.set(key, feats)
+        if (cache.size > MAX_CACHED_TILES) cache.delete(cache.keys().next().value as string)
+      }
+      return feats
+    }))
+    if (gen !== generation) return
+    const source = map.getSource(src) as maplibregl.GeoJSONSource | undefined
+    source?.setData({ type: 'FeatureCollection', features: parts.flat() })
+  }
+
+  handlers.set(src, sync)
+  map.on('moveend', sync)
+  sync()
+}
+
+export function removeH3Source(map: maplibregl.Map, src: string) {
+  const sync = handlers.get(src)
+  if (sync) { map.off('moveend', sync); handlers.delete(src) }
+}
@@ -21,8 +21,17 @@ export interface User {
 
 export interface DbLayer {
   id: number;
+  public_id?: string;
   name: string;
   description?: string | null;
+  copyrights?: string[] | null;
+  is_default?: boolean;
   created_at?: string | null;
-  bbox?: GeoJSON.Polygon | GeoJSON.MultiPolygon | null;
+  updated_at?: string | null;
+  version?: number;
+  bbox?: GeoJSON.Polygon | GeoJSON.MultiPolygon | GeoJSON.Point | GeoJSON.LineString | null;
+  feature_count?: number;
+  min_zoom?: number | null;
+  max_zoom?: number | null;
+  h3_resolution?: number | null;
 }